@@ -1,7 +1,10 @@
 import pyvisa
 import time
 import csv
+from datetime import datetime
 from SAE_POO import Instrument
+from trace_arv import Trace
+from tampon_circulaire import TamponCirculaire
 
 
 class ARV_S2VNA(Instrument):
@@ -124,3 +127,119 @@ class ARV_S2VNA(Instrument):
         self.write(f"CALC:PAR:SEL {param_S}")  # Sélection du paramètre défini
         self.write(f"DISP:WIND:TRAC1:FEED {param_S}")  # Affichage sur la fenêtre de trace
         print(f"Paramètre {param_S} défini via CALC:CONV:FUNC S.")
+
+    def get_plan_frequence(self):
+        """Renvoie (start, stop, nombre de points) du balayage en cours."""
+        start = float(self.query("SENS:FREQ:STAR?"))
+        stop = float(self.query("SENS:FREQ:STOP?"))
+        points = int(float(self.query("SENS:SWE:POIN?")))
+        return start, stop, points
+
+    def lire_trace(self, start=None, stop=None, param_S="S21"):
+        """Lit la trace affichée (CALC:DATA:FDAT?) et la renvoie sous forme de Trace en dB."""
+        if start is None or stop is None:
+            start, stop, _ = self.get_plan_frequence()
+        reponse = self.query("CALC:DATA:FDAT?")
+        # FDAT renvoie des couples (valeur, 0) : seule la partie réelle est utile en log mag
+        trace = Trace.depuis_scpi(reponse, start, stop, complexe=True, param_S=param_S)
+        return Trace.lineaire(start, stop, trace.valeurs.real, param_S=param_S, unite="dB",
+                              horodatage=datetime.now())
+
+    def lire_trace_complexe(self, start=None, stop=None, param_S="S21"):
+        """Lit les données brutes complexes (CALC:DATA:SDAT?) et les renvoie sous forme de Trace complex128."""
+        if start is None or stop is None:
+            start, stop, _ = self.get_plan_frequence()
+        reponse = self.query("CALC:DATA:SDAT?")
+        return Trace.depuis_scpi(reponse, start, stop, complexe=True, param_S=param_S, unite="",
+                                 horodatage=datetime.now())
+
+    def balayage_complexe(self, start=None, stop=None, param_S="S21"):
+        """Déclenche un balayage unique, attend la fin (*OPC?) et renvoie la trace complexe."""
+        self.write("TRIG:SING")
+        self.query("*OPC?")
+        return self.lire_trace_complexe(start, stop, param_S)
+
+    def mesure_moyennee(self, moyennage, param_S="S21"):
+        """
+        Moyennage côté PC (voir moyennage.MoyenneConvergente) au lieu d'un facteur de
+        moyennage fixe sur l'ARV : on s'arrête dès que les métriques sont stables.
+        """
+        if self.device is None:
+            print("Pas de connexion active.")
+            return None
+        start, stop, _ = self.get_plan_frequence()
+        # Réglages de l'utilisateur, remis en place après le moyennage
+        etat = self.get_declenchement()
+        moyennage_arv = self.query("SENS:AVER?").strip() in ("1", "ON")
+        # Moyennage de l'instrument coupé, balayages déclenchés un par un
+        self.write("SENS:AVER OFF")
+        self.set_balayage_continu(True)
+        try:
+            resultat = moyennage.moyenner(lambda: self.balayage_complexe(start, stop, param_S))
+        finally:
+            self.write(f"SENS:AVER {'ON' if moyennage_arv else 'OFF'}")
+            self.set_declenchement(etat)
+        print(f"Moyennage : {resultat['balayages']} balayages "
+              f"({'convergé' if resultat['converge'] else 'non convergé'})")
+        return resultat
+
+    def set_balayage_continu(self, actif=True):
+        """Active le balayage continu, déclenché par le bus pour récupérer chaque balayage complet."""
+        if actif:
+            self.write("INIT:CONT ON")
+            self.write("TRIG:SOUR BUS")
+        else:
+            # Retour au déclenchement interne (fonctionnement normal de l'écran)
+            self.write("TRIG:SOUR INT")
+
+    def get_declenchement(self):
+        """Renvoie (balayage continu, source de déclenchement) pour pouvoir les restaurer."""
+        continu = self.query("INIT:CONT?").strip() in ("1", "ON")
+        source = self.query("TRIG:SOUR?").strip()
+        return continu, source
+
+    def set_declenchement(self, etat):
+        """Restaure un état lu par get_declenchement."""
+        continu, source = etat
+        self.write(f"INIT:CONT {'ON' if continu else 'OFF'}")
+        self.write(f"TRIG:SOUR {source}")
+
+    def surveiller(self, chemin_tampon, capacite=3600, duree=None, nb_balayages=None,
+                   param_S="S21", intervalle=0.0, afficher_tous=60):
+        """
+        Mode surveillance : balayages en continu écrits dans un tampon circulaire sur disque
+        (voir TamponCirculaire). La mémoire reste constante, et le fichier peut être lu
+        en direct par un autre processus. S'arrête après `duree` secondes, `nb_balayages`
+        balayages, ou sur Ctrl+C.
+        """
+        if self.device is None:
+            print("Pas de connexion active.")
+            return None
+
+        start, stop, points = self.get_plan_frequence()
+        tampon = TamponCirculaire(chemin_tampon, capacite=capacite, npoints=points, start=start, stop=stop)
+        print(f"Surveillance de {param_S} : {points} points, tampon {chemin_tampon} ({capacite} balayages)")
+
+        etat = self.get_declenchement()
+        self.set_balayage_continu(True)
+        debut = time.time()
+        n = 0
+        try:
+            while (duree is None or time.time() - debut < duree) and (nb_balayages is None or n < nb_balayages):
+                # Un balayage complet, puis lecture de la trace
+                self.write("TRIG:SING")
+                self.query("*OPC?")
+                tampon.ajouter(self.lire_trace(start, stop, param_S))
+                n += 1
+                if afficher_tous and n % afficher_tous == 0:
+                    m = tampon.metriques(afficher_tous)
+                    print(f"{n} balayages - pic {m['pic_freq']/1e6:.3f} MHz "
+                          f"(dérive {m['derive_pic']/1e3:+.1f} kHz), bande -3 dB {m['bande_3db']/1e6:.3f} MHz")
+                if intervalle:
+                    time.sleep(intervalle)
+        except KeyboardInterrupt:
+            print("Surveillance interrompue.")
+        finally:
+            self.set_declenchement(etat)
+            tampon.flush()
+        return tampon
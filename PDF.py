@@ -38,6 +38,14 @@ class Creation_PDF(FPDF):
         # Supprime l’image après l’avoir utilisée
         os.remove(chemin_img)
 
+    def ajouter_defauts(self, defauts, titre="Discontinuités détectées (domaine temporel) :"):
+        """Ajoute la liste des défauts trouvés par domaine_temporel.localiser_defauts"""
+        if not defauts:
+            self.ajouter_texte(f"{titre}\n- aucune")
+            return
+        lignes = [f"- {d['distance']:.3f} m ({d['temps']*1e9:.2f} ns) : {d['niveau']:.1f} dB" for d in defauts]
+        self.ajouter_texte(titre + "\n" + "\n".join(lignes))
+
     def generer(self, chemin_pdf):
         """Crée le fichier PDF final"""
         self.output(chemin_pdf)
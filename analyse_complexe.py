@@ -0,0 +1,103 @@
+import numpy as np
+from trace_arv import Trace
+
+
+class AnalyseComplexe:
+    """
+    Analyse d'une trace complexe (S21 ou S11) sur tous les points du balayage :
+    module en dB, phase déroulée, temps de propagation de groupe et, sur la bande
+    passante, perte d'insertion, ondulation et planéité du temps de groupe.
+    Tout est vectorisé sur le dernier axe : une Trace 2D (lot de DUT) donne un résultat par DUT.
+    """
+    def __init__(self, trace):
+        if not np.iscomplexobj(trace.valeurs):
+            raise ValueError("L'analyse complexe demande une trace complexe (re, im).")
+        self.trace = trace
+        self._module_db = None
+        self._phase = None
+
+    @classmethod
+    def depuis_scpi(cls, reponse, start, stop, param_S="S21"):
+        """Réponse SCPI re0, im0, re1, im1, ... convertie en une fois en complex128."""
+        return cls(Trace.depuis_scpi(reponse, start, stop, complexe=True, param_S=param_S, unite=""))
+
+    @property
+    def freqs(self):
+        return self.trace.freqs
+
+    @property
+    def module_db(self):
+        """20·log10|S| pour chaque point."""
+        if self._module_db is None:
+            self._module_db = 20 * np.log10(np.abs(self.trace.valeurs))
+        return self._module_db
+
+    @property
+    def phase(self):
+        """Phase déroulée (rad) le long du balayage."""
+        if self._phase is None:
+            self._phase = np.unwrap(np.angle(self.trace.valeurs), axis=-1)
+        return self._phase
+
+    def phase_degres(self):
+        return np.rad2deg(self.phase)
+
+    def temps_de_groupe(self, ouverture=1):
+        """
+        Temps de propagation de groupe τ = -dφ/dω (s), calculé par différence centrée
+        sur ±ouverture points : une ouverture plus grande lisse le bruit de phase.
+        Aux bords du balayage, la différence est faite sur les points disponibles.
+        """
+        n = self.trace.npoints
+        k = max(int(ouverture), 1)
+        idx = np.arange(n)
+        i0 = np.clip(idx - k, 0, n - 1)
+        i1 = np.clip(idx + k, 0, n - 1)
+        f = self.freqs
+        dphi = self.phase[..., i1] - self.phase[..., i0]
+        return -dphi / (2 * np.pi * (f[i1] - f[i0]))
+
+    def bande_passante(self, f_min, f_max, ouverture=1):
+        """
+        Grandeurs sur la bande passante [f_min, f_max] (par DUT pour un lot) :
+        - perte_insertion : perte minimale (dB, positive) = -max|S21|
+        - perte_moyenne : perte moyenne sur la bande (dB)
+        - ondulation : écart max - min du module (dB)
+        - tdg_moyen, tdg_variation : temps de groupe moyen et écart max - min (s)
+        """
+        i0, i1 = self.trace.indices(f_min, f_max)
+        if i1 <= i0:
+            raise ValueError("Aucun point de mesure dans la bande demandée.")
+        module = self.module_db[..., i0:i1]
+        tdg = self.temps_de_groupe(ouverture)[..., i0:i1]
+        return {
+            "perte_insertion": -module.max(axis=-1),
+            "perte_moyenne": -module.mean(axis=-1),
+            "ondulation": module.max(axis=-1) - module.min(axis=-1),
+            "tdg_moyen": tdg.mean(axis=-1),
+            "tdg_variation": tdg.max(axis=-1) - tdg.min(axis=-1),
+        }
+
+    def perte_a(self, freq):
+        """Perte d'insertion (dB, positive) à une fréquence donnée, interpolée entre deux points."""
+        f = self.freqs
+        j = int(np.clip(np.searchsorted(f, freq), 1, len(f) - 1))
+        t = np.clip((freq - f[j - 1]) / (f[j] - f[j - 1]), 0.0, 1.0)
+        module = self.module_db
+        perte = -(module[..., j - 1] + t * (module[..., j] - module[..., j - 1]))
+        return float(perte) if module.ndim == 1 else perte
+
+    def verifier_tdg(self, f_min, f_max, variation_max, ouverture=1):
+        """True (par DUT) si la variation du temps de groupe sur la bande reste sous variation_max (s)."""
+        return self.bande_passante(f_min, f_max, ouverture)["tdg_variation"] <= variation_max
+
+    def traces(self, ouverture=1):
+        """Module, phase et temps de groupe sous forme de Traces (pour TracerCourbes / le PDF)."""
+        t = self.trace
+        meta = {"param_S": t.param_S, "horodatage": t.horodatage}
+        axe = {"start": t.start, "stop": t.stop} if t.est_lineaire else {"freqs": t.freqs}
+        return {
+            "module": Trace(self.module_db, unite="dB", **axe, **meta),
+            "phase": Trace(self.phase_degres(), unite="deg", **axe, **meta),
+            "temps_de_groupe": Trace(self.temps_de_groupe(ouverture), unite="s", **axe, **meta),
+        }
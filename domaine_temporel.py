@@ -0,0 +1,240 @@
+from collections import OrderedDict
+import numpy as np
+from trace_arv import Trace
+
+# Vitesse de la lumière dans le vide (m/s)
+C0 = 299792458.0
+
+# Plans de calcul (fenêtres, tables de chirp) déjà préparés, indexés par plan de fréquence.
+# Cache LRU borné : un zoom temporel différent à chaque appel ne fait pas grossir la mémoire.
+_cache_plans = OrderedDict()
+TAILLE_CACHE_PLANS = 32
+
+
+class PlanTemporel:
+    """
+    Tables précalculées pour un plan de fréquence donné : fenêtre de Kaiser, taille des FFT
+    et, si une plage de temps est demandée, tables de la transformée en Z chirp (Bluestein).
+    Un plan est calculé une seule fois puis réutilisé pour toutes les traces du même balayage.
+    """
+    __slots__ = ("mode", "npoints", "pas", "nfft", "dt", "fenetre", "norme",
+                 "temps", "czt_pre", "czt_noyau", "czt_post", "czt_taille")
+
+    def __init__(self, start, stop, npoints, mode, beta, zero_padding, t_debut=None, t_fin=None, n_temps=None):
+        self.mode = mode
+        self.pas = (stop - start) / (npoints - 1)
+
+        if mode == "passe_bas":
+            # Le passe-bas suppose un balayage harmonique (f_k = k·pas) : on ajoute le point DC
+            if abs(start - self.pas) > 1e-3 * self.pas:
+                raise ValueError("Mode passe-bas : le balayage doit être harmonique (start = pas).")
+            self.npoints = npoints + 1
+            # Demi-fenêtre : le spectre est unilatéral, la fenêtre est centrée sur le DC
+            self.fenetre = np.kaiser(2 * self.npoints - 1, beta)[self.npoints - 1:]
+            # irfft : 2·(N-1) points réels, prolongés par le zero-padding
+            self.nfft = 2 * (self.npoints - 1) * int(zero_padding)
+            somme = self.fenetre[0] + 2 * self.fenetre[1:].sum()
+        elif mode == "passe_bande":
+            self.npoints = npoints
+            self.fenetre = np.kaiser(npoints, beta)
+            self.nfft = npoints * int(zero_padding)
+            somme = self.fenetre.sum()
+        else:
+            raise ValueError(f"Mode inconnu : {mode} (passe_bas ou passe_bande)")
+
+        self.dt = 1.0 / (self.nfft * self.pas)
+        # Normalisation : une réponse plate de niveau c donne une impulsion de hauteur c
+        self.norme = 1.0 / somme
+        self.temps = np.arange(self.nfft) * self.dt
+        self.czt_pre = self.czt_noyau = self.czt_post = None
+        self.czt_taille = 0
+
+        if t_debut is not None:
+            self._preparer_czt(t_debut, t_fin, int(n_temps))
+
+    def _preparer_czt(self, t_debut, t_fin, n_temps):
+        """
+        Tables de Bluestein pour évaluer la réponse uniquement sur [t_debut, t_fin]
+        (zoom temporel avec n_temps points, sans FFT géante) :
+        y_m = Σ_k x_k · exp(j2π·k·pas·t_m), avec t_m = t_debut + m·dt.
+        """
+        n = self.npoints
+        dt = (t_fin - t_debut) / max(n_temps - 1, 1)
+        k = np.arange(n)
+        m = np.arange(n_temps)
+        phi = 2 * np.pi * self.pas * dt
+        self.czt_taille = 1 << int(np.ceil(np.log2(n + n_temps - 1)))
+        self.czt_pre = self.fenetre * np.exp(1j * (2 * np.pi * self.pas * t_debut * k + phi * k ** 2 / 2))
+        self.czt_post = np.exp(1j * phi * m ** 2 / 2)
+        # Noyau exp(-j·phi·(m-k)²/2) pour (m-k) de -(n-1) à n_temps-1, rangé pour une convolution circulaire
+        noyau = np.zeros(self.czt_taille, dtype=np.complex128)
+        noyau[:n_temps] = np.exp(-1j * phi * m ** 2 / 2)
+        noyau[self.czt_taille - n + 1:] = np.exp(-1j * phi * (np.arange(n - 1, 0, -1)) ** 2 / 2)
+        self.czt_noyau = np.fft.fft(noyau)
+        self.temps = t_debut + m * dt
+
+    def czt(self, x):
+        """Somme Σ_k fenetre_k·x_k·exp(j2π·k·pas·t_m) sur la grille zoomée, par lot (dernier axe)."""
+        m = len(self.temps)
+        y = np.fft.fft(x * self.czt_pre, n=self.czt_taille, axis=-1)
+        y = np.fft.ifft(y * self.czt_noyau, axis=-1)[..., :m]
+        return y * self.czt_post
+
+
+def plan_temporel(trace, mode="passe_bas", beta=6.0, zero_padding=4, t_debut=None, t_fin=None, n_temps=None):
+    """Renvoie le plan de calcul pour le balayage de `trace` (pris dans le cache si possible)."""
+    if not trace.est_lineaire:
+        raise ValueError("La transformée temporelle demande un balayage linéaire.")
+    cle = (trace.start, trace.stop, trace.npoints, mode, float(beta), int(zero_padding), t_debut, t_fin, n_temps)
+    plan = _cache_plans.get(cle)
+    if plan is None:
+        plan = PlanTemporel(trace.start, trace.stop, trace.npoints, mode, beta, zero_padding,
+                            t_debut, t_fin, n_temps)
+        _cache_plans[cle] = plan
+        if len(_cache_plans) > TAILLE_CACHE_PLANS:
+            _cache_plans.popitem(last=False)   # le plan utilisé le moins récemment
+    else:
+        _cache_plans.move_to_end(cle)
+    return plan
+
+
+class TransformeeTemporelle:
+    """
+    Analyse dans le domaine temporel (TDR sur S11, TDT sur S21) de traces complexes.
+    - passe_bas : réponse réelle (impulsion ou échelon), demande un balayage harmonique
+    - passe_bande : réponse complexe (enveloppe), fonctionne sur n'importe quel balayage
+    Les calculs sont faits par lot : une Trace 2D donne une réponse par ligne.
+    """
+    # Valeurs de beta usuelles des ARV pour la fenêtre de Kaiser
+    FENETRES = {"minimum": 0.0, "normale": 6.0, "maximum": 13.0}
+
+    def __init__(self, mode="passe_bas", fenetre="normale", zero_padding=4):
+        self.mode = mode
+        self.beta = self.FENETRES.get(fenetre, fenetre)
+        self.zero_padding = zero_padding
+
+    def _spectre(self, trace):
+        """Données complexes prêtes pour la transformée (avec le point DC en passe-bas)."""
+        x = trace.valeurs
+        if not np.iscomplexobj(x):
+            raise ValueError("La transformée temporelle demande une trace complexe (re, im).")
+        if self.mode == "passe_bas":
+            # Point DC extrapolé linéairement à partir des deux premiers points (partie réelle)
+            dc = (2 * x[..., 0] - x[..., 1]).real
+            x = np.concatenate([dc[..., None].astype(np.complex128), x], axis=-1)
+        return x
+
+    def _vers_trace(self, trace, temps, valeurs, unite):
+        # L'axe de la Trace renvoyée est le temps (s) au lieu de la fréquence
+        return Trace.lineaire(temps[0], temps[-1], valeurs, param_S=trace.param_S, unite=unite,
+                              horodatage=trace.horodatage)
+
+    def impulsion(self, trace, t_debut=None, t_fin=None, n_temps=1001):
+        """
+        Réponse impulsionnelle. Sans plage de temps : FFT complète (avec zero-padding).
+        Avec t_debut/t_fin : zoom par transformée en Z chirp sur n_temps points.
+        """
+        zoom = t_debut is not None
+        plan = plan_temporel(trace, self.mode, self.beta, self.zero_padding,
+                             t_debut if zoom else None, t_fin if zoom else None, n_temps if zoom else None)
+        x = self._spectre(trace)
+
+        if zoom:
+            y = plan.czt(x)
+            if self.mode == "passe_bas":
+                # Spectre hermitien : h = X0 + 2·Re(Σ_{k≥1}) = 2·Re(Σ_{k≥0}) - X0
+                y = 2 * y.real - (x[..., 0].real * plan.fenetre[0])[..., None]
+            return self._vers_trace(trace, plan.temps, y * plan.norme, "impulsion")
+
+        xw = x * plan.fenetre
+        if self.mode == "passe_bas":
+            h = np.fft.irfft(xw, n=plan.nfft, axis=-1) * plan.nfft
+        else:
+            h = np.fft.ifft(xw, n=plan.nfft, axis=-1) * plan.nfft
+        return self._vers_trace(trace, plan.temps, h * plan.norme, "impulsion")
+
+    def echelon(self, trace, t_debut=None, t_fin=None, n_temps=1001):
+        """Réponse indicielle (passe-bas uniquement) : intégrale de la réponse impulsionnelle."""
+        if self.mode != "passe_bas":
+            raise ValueError("La réponse indicielle n'existe qu'en mode passe-bas.")
+        plan = plan_temporel(trace, self.mode, self.beta, self.zero_padding)
+        x = self._spectre(trace) * plan.fenetre
+        # La réponse impulsionnelle est périodique : sa moitié « temps négatifs » est rangée
+        # à la fin du tableau. On la ramène devant (axe de -T/2 à T/2) pour que l'intégrale
+        # parte de -T/2, où la réponse est nulle : un échelon plat c atteint c juste après t=0.
+        h = np.fft.irfft(x, n=plan.nfft, axis=-1)
+        s = np.cumsum(np.roll(h, plan.nfft // 2, axis=-1), axis=-1)
+        temps = plan.temps - (plan.nfft // 2) * plan.dt
+        if t_debut is not None:
+            # Zoom : interpolation sur la grille fine (l'échelon est une courbe lisse).
+            # Indices et poids calculés une fois, puis appliqués à toutes les lignes du lot
+            grille = np.linspace(t_debut, t_fin, n_temps)
+            j = np.clip(np.searchsorted(temps, grille), 1, len(temps) - 1)
+            w = np.clip((grille - temps[j - 1]) / (temps[j] - temps[j - 1]), 0.0, 1.0)
+            s = s[..., j - 1] + w * (s[..., j] - s[..., j - 1])
+            temps = grille
+        return self._vers_trace(trace, temps, s, "echelon")
+
+    def porte(self, trace, t_debut, t_fin, flanc=0.1):
+        """
+        Fenêtrage temporel (gating) : ne garde que la réponse entre t_debut et t_fin,
+        puis revient dans le domaine fréquentiel. Renvoie une Trace complexe sur les
+        fréquences d'origine (utile pour retirer l'effet d'un connecteur ou d'un câble).
+        """
+        plan = plan_temporel(trace, "passe_bande", self.beta, self.zero_padding)
+        x = trace.valeurs * plan.fenetre
+        h = np.fft.ifft(x, n=plan.nfft, axis=-1)
+
+        # Porte rectangulaire à flancs en cosinus surélevé
+        t = plan.temps
+        largeur = max((t_fin - t_debut) * flanc, plan.dt)
+        porte = np.clip(np.minimum(t - t_debut, t_fin - t) / largeur + 0.5, 0.0, 1.0)
+        porte = 0.5 - 0.5 * np.cos(np.pi * porte)
+
+        y = np.fft.fft(h * porte, axis=-1)[..., :trace.npoints]
+        # On retire l'effet de la fenêtre de Kaiser (bords du balayage protégés)
+        y = y / np.maximum(plan.fenetre, 1e-3)
+        return Trace.lineaire(trace.start, trace.stop, y, param_S=trace.param_S, unite="",
+                              horodatage=trace.horodatage)
+
+
+def distance(temps, facteur_vitesse=0.66, reflexion=True):
+    """Convertit un temps en distance (m). En réflexion (TDR), le signal fait l'aller-retour."""
+    d = np.asarray(temps) * C0 * facteur_vitesse
+    return d / 2 if reflexion else d
+
+
+def localiser_defauts(reponse, seuil_db=-30.0, facteur_vitesse=0.66, reflexion=True):
+    """
+    Repère les discontinuités d'impédance : maxima locaux de |réponse impulsionnelle|
+    au-dessus de seuil_db. Renvoie une liste de dictionnaires (temps, distance, niveau).
+    """
+    v = np.abs(reponse.valeurs)
+    if v.ndim != 1:
+        raise ValueError("localiser_defauts attend une seule réponse (pas un lot).")
+    with np.errstate(divide="ignore"):
+        niveau = 20 * np.log10(v)
+    temps = reponse.freqs
+    # Maxima locaux : plus grands que leurs deux voisins
+    pics = np.flatnonzero((niveau[1:-1] > niveau[:-2]) & (niveau[1:-1] >= niveau[2:]) & (niveau[1:-1] > seuil_db)) + 1
+    return [{"temps": float(temps[i]),
+             "distance": float(distance(temps[i], facteur_vitesse, reflexion)),
+             "niveau": float(niveau[i])} for i in pics]
+
+
+if __name__ == "__main__":
+    # Vérification : un court-circuit au plan de référence (réflexion plate de 1)
+    # donne un échelon nul avant t=0 et égal à 1 juste après
+    pas, n = 10e6, 200
+    court_circuit = Trace.lineaire(pas, pas * n, np.ones(n, dtype=np.complex128), param_S="S11", unite="")
+    echelon = TransformeeTemporelle().echelon(court_circuit)
+    temps, valeurs = echelon.freqs, echelon.valeurs
+    resolution = 1.0 / (pas * n)
+    avant = valeurs[temps < -5 * resolution]
+    apres = valeurs[temps > 5 * resolution]
+    print(f"Échelon avant t=0 : max |s| = {np.abs(avant).max():.4f}")
+    print(f"Échelon après t=0 : {apres.min():.4f} … {apres.max():.4f}")
+    assert np.abs(avant).max() < 0.01 and np.abs(apres - 1).max() < 0.01, "Réponse indicielle fausse"
+    zoom = TransformeeTemporelle().echelon(court_circuit, -2e-9, 2e-9, 401)
+    assert abs(zoom.valeurs[-1] - 1) < 0.01, "Réponse indicielle zoomée fausse"
+    print("Réponse indicielle : OK")
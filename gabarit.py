@@ -1,3 +1,9 @@
+import hashlib
+import json
+import numpy as np
+import yaml
+
+
 class Gabarit:
     def __init__(self, freq_min, freq_max, att_min, att_max):
         # Définition des bornes du gabarit en fréquence et en atténuation
@@ -11,6 +17,11 @@ class Gabarit:
         return (self.freq_min <= freq <= self.freq_max and
                 self.att_min <= valeur <= self.att_max)
 
+    def masque(self, freqs, valeurs):
+        # Version vectorisée : tableau de booléens, True pour chaque point dans le gabarit
+        return ((freqs >= self.freq_min) & (freqs <= self.freq_max) &
+                (valeurs >= self.att_min) & (valeurs <= self.att_max))
+
     def tracer(self, ax, label):
         # Trace les limites du gabarit sur un graphique 
         ax.axvline(self.freq_min, color='r', linestyle='--', alpha=0.5)  # Limite gauche
@@ -23,3 +34,153 @@ class Gabarit:
             self.att_min, self.att_max,
             color='#FFFF00', alpha=0.4, label='Gabarit'
         )
+
+
+# Cache des gabarits compilés, indexé par l'empreinte de leur spécification
+_cache_gabarits = {}
+
+
+def _empreinte_spec(spec):
+    """Empreinte (sha1) d'une spécification de gabarit, indépendante de l'ordre des clés."""
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=float).encode()).hexdigest()
+
+
+def _compiler_limite(polylignes):
+    """
+    Transforme une liste de polylignes [[f, dB], [f, dB], ...] en tableaux de segments
+    triés par fréquence : (f0, f1, a0, a1). Deux polylignes peuvent laisser un trou
+    entre elles : aucune limite n'est appliquée dans ce trou. Des segments qui se
+    chevauchent sont refusés (la limite serait ambiguë).
+    """
+    segments = []
+    for points in polylignes or []:
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        pts = pts[np.argsort(pts[:, 0], kind="stable")]
+        for (f0, a0), (f1, a1) in zip(pts[:-1], pts[1:]):
+            if f1 > f0:
+                segments.append((f0, f1, a0, a1))
+    if not segments:
+        vide = np.empty(0, dtype=np.float64)
+        return vide, vide, vide, vide
+    segments = np.array(sorted(segments), dtype=np.float64)
+    chevauchement = np.flatnonzero(segments[1:, 0] < segments[:-1, 1])
+    if len(chevauchement):
+        i = chevauchement[0]
+        raise ValueError(f"Segments de gabarit qui se chevauchent : "
+                         f"{segments[i, 0]:g}-{segments[i, 1]:g} Hz et {segments[i + 1, 0]:g}-{segments[i + 1, 1]:g} Hz")
+    return (np.ascontiguousarray(segments[:, 0]), np.ascontiguousarray(segments[:, 1]),
+            np.ascontiguousarray(segments[:, 2]), np.ascontiguousarray(segments[:, 3]))
+
+
+class GabaritCompile:
+    """Limites haute et basse compilées en tableaux de segments triés."""
+    __slots__ = ("empreinte", "haute", "basse")
+
+    def __init__(self, spec):
+        self.empreinte = _empreinte_spec(spec)
+        self.haute = _compiler_limite(spec.get("limite_haute"))
+        self.basse = _compiler_limite(spec.get("limite_basse"))
+
+    @staticmethod
+    def _interpoler(limite, freqs):
+        # Une seule recherche triée + une interpolation vectorisée pour tous les points
+        f0, f1, a0, a1 = limite
+        resultat = np.full(freqs.shape, np.nan)
+        if len(f0) == 0:
+            return resultat
+        idx = np.searchsorted(f0, freqs, side="right") - 1
+        valide = idx >= 0
+        idx = np.clip(idx, 0, None)
+        valide &= freqs <= f1[idx]
+        # À la jonction de deux segments, c'est celui qui commence à cette fréquence qui s'applique
+        t = (freqs - f0[idx]) / (f1[idx] - f0[idx])
+        resultat[valide] = (a0[idx] + t * (a1[idx] - a0[idx]))[valide]
+        return resultat
+
+    def limites(self, freqs):
+        """Renvoie (limite haute, limite basse) à chaque fréquence (NaN = pas de limite)."""
+        freqs = np.asarray(freqs, dtype=np.float64)
+        return self._interpoler(self.haute, freqs), self._interpoler(self.basse, freqs)
+
+
+def compiler_gabarit(spec):
+    """Compile une spécification de gabarit, ou la reprend du cache si déjà compilée."""
+    empreinte = _empreinte_spec(spec)
+    compile_ = _cache_gabarits.get(empreinte)
+    if compile_ is None:
+        compile_ = GabaritCompile(spec)
+        _cache_gabarits[empreinte] = compile_
+    return compile_
+
+
+class GabaritLineaire:
+    """
+    Gabarit défini par une limite haute et une limite basse linéaires par morceaux.
+    Chaque limite est une liste de polylignes [[f (Hz), niveau (dB)], ...], ce qui permet
+    de décrire des flancs en pente et autant de points de cassure que nécessaire.
+    """
+    def __init__(self, nom, limite_haute=None, limite_basse=None, description=""):
+        self.nom = nom
+        self.description = description
+        self.spec = {
+            "limite_haute": [[[float(f), float(a)] for f, a in p] for p in (limite_haute or [])],
+            "limite_basse": [[[float(f), float(a)] for f, a in p] for p in (limite_basse or [])],
+        }
+        # Compilé une seule fois (et partagé entre DUT grâce au cache)
+        self.compile = compiler_gabarit(self.spec)
+
+    @classmethod
+    def depuis_yaml(cls, chemin_yaml):
+        """Charge tous les gabarits d'un fichier YAML (voir Gabarits.yaml) dans un dictionnaire."""
+        with open(chemin_yaml, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        gabarits = {}
+        for nom, spec in (config.get("gabarits") or {}).items():
+            gabarits[nom] = cls(nom, spec.get("limite_haute"), spec.get("limite_basse"),
+                                spec.get("description", ""))
+        return gabarits
+
+    def limites(self, freqs):
+        return self.compile.limites(freqs)
+
+    def marges(self, freqs, valeurs):
+        """Marge (dB) de chaque point par rapport au gabarit : négative = hors gabarit."""
+        haute, basse = self.limites(freqs)
+        valeurs = np.asarray(valeurs, dtype=np.float64)
+        # np.fmin ignore les NaN : une fréquence sans limite n'a pas de contrainte
+        return np.fmin(haute - valeurs, valeurs - basse)
+
+    def masque(self, freqs, valeurs):
+        # Même convention que Gabarit.masque : True pour chaque point en défaut
+        return self.marges(freqs, valeurs) < 0
+
+    def est_conforme(self, trace):
+        """Vérifie qu'une Trace respecte le gabarit sur tous ses points."""
+        trace = trace.en_db()
+        return not self.masque(trace.freqs, trace.valeurs).any()
+
+    def bande_utile(self):
+        """
+        Bande passante spécifiée (f_min, f_max) en Hz : étendue de la limite basse.
+        None si le gabarit n'a pas de limite basse (pas de bande passante définie).
+        """
+        freqs = [f for points in self.spec["limite_basse"] for f, _ in points]
+        if not freqs:
+            return None
+        return min(freqs), max(freqs)
+
+    def tracer(self, ax, label):
+        # Trace les limites : rouge pour la limite haute, vert pour la limite basse
+        for cle, couleur in (("limite_haute", 'r'), ("limite_basse", 'g')):
+            for points in self.spec[cle]:
+                f, a = zip(*points)
+                ax.plot(f, a, color=couleur, linestyle='--', alpha=0.7, label=label)
+
+    def texte(self):
+        """Description lisible du gabarit, pour le rapport PDF."""
+        lignes = [f"{self.nom}" + (f" : {self.description}" if self.description else "")]
+        for cle, titre in (("limite_haute", "max"), ("limite_basse", "min")):
+            for points in self.spec[cle]:
+                morceaux = " → ".join(f"{f/1e9:.2f} GHz / {a:g} dB" for f, a in points)
+                lignes.append(f"- {titre} : {morceaux}")
+        return "\n".join(lignes) + "\n"
@@ -2,7 +2,7 @@ import pyvisa
 import yaml
 import re
 import numpy as np
-import json
+from trace_arv import Trace
 
 
 class InstrumentBase:
@@ -35,7 +35,10 @@ class SimulatedInstrument(InstrumentBase):
         self.state = {
             "sparameter": "S21",
             "power": -10,
-            "frequency": 868e6
+            "frequency": 868e6,
+            "start": 800e6,
+            "stop": 950e6,
+            "points": 201
         }
 
     def GEN_CURVE(self, start, stop, points):
@@ -44,12 +47,14 @@ class SimulatedInstrument(InstrumentBase):
         freqs = np.linspace(start, stop, int(points))
         # Génération d’une courbe avec une forme gaussienne simulant une résonance
         values = -20 + 10 * np.exp(-((freqs - 868e6)**2) / (2 * (0.5e6)**2))
-        # Conversion en JSON pour imiter une vraie réponse instrument
-        return json.dumps({
-            "frequencies": freqs.tolist(),
-            "values": values.tolist(),
-            "parameter": self.state["sparameter"]
-        })
+        # La courbe est renvoyée directement sous forme de Trace (axe linéaire implicite)
+        return Trace.lineaire(start, stop, values, param_S=self.state["sparameter"], unite="dB")
+
+    def GEN_POPULATION(self, start, stop, points, n_dut, seed=None, **options):
+        """Simule les courbes S21 de n_dut filtres différents (tableau 2D dans une Trace)"""
+        generateur = GenerateurPopulation(f0=self.state["frequency"], seed=seed, **options)
+        trace, _ = generateur.generer(n_dut, start, stop, points)
+        return trace
 
     def get_parameter(self, param_name):
         # Recherche de la propriété dans le YAML
@@ -62,8 +67,9 @@ class SimulatedInstrument(InstrumentBase):
         match = re.search(r"\{(\w+)\((.*?)\)\}", r)
         if match:
             func, args = match.groups()
-            # Conversion des arguments en float
-            args = [float(a) for a in args.split(',')]
+            # Conversion des arguments en float ({start} → valeur de l'état interne)
+            args = [float(self.state[a.strip()[1:-1]]) if a.strip().startswith('{') else float(a)
+                    for a in args.split(',')]
             # Appel de la fonction simulée correspondante
             if func == "GEN_CURVE":
                 return self.GEN_CURVE(*args)
@@ -78,8 +84,98 @@ class SimulatedInstrument(InstrumentBase):
         raise ValueError(f"Paramètre {param_name} non reconnu.")
 
     def measure(self):
-        # Appelle la fonction de mesure définie dans le YAML et renvoie les données
-        return json.loads(self.get_parameter("measure_curve"))
+        # Appelle la fonction de mesure définie dans le YAML et renvoie la Trace
+        return self.get_parameter("measure_curve")
+
+
+class GenerateurPopulation:
+    """
+    Génère d'un coup une population de filtres passe-bande (Tchebychev, résonateurs couplés)
+    avec des dispersions de composants, du bruit et quelques pièces défectueuses.
+    Le calcul est entièrement vectorisé : une ligne du tableau renvoyé = un DUT.
+    """
+    # Dispersions par défaut (écart-type) : relatives pour f0/bande/q, en dB pour l'ondulation
+    TOLERANCES = {"f0": 0.002, "bande": 0.03, "q": 0.10, "ondulation": 0.1}
+
+    def __init__(self, f0=868e6, bande=20e6, ordre=5, ondulation=0.5, q=800,
+                 tolerances=None, bruit_db=0.05, plancher_db=-90, taux_defaut=0.02, seed=None):
+        self.f0 = f0                    # fréquence centrale nominale (Hz)
+        self.bande = bande              # bande passante nominale (Hz)
+        self.ordre = int(ordre)         # nombre de résonateurs
+        self.ondulation = ondulation    # ondulation nominale dans la bande (dB)
+        self.q = q                      # facteur de qualité à vide des résonateurs
+        self.tolerances = dict(self.TOLERANCES, **(tolerances or {}))
+        self.bruit_db = bruit_db        # bruit de trace (écart-type, dB)
+        self.plancher_db = plancher_db  # plancher de bruit de l'analyseur (dB)
+        self.taux_defaut = taux_defaut  # proportion de pièces défectueuses
+        # Générateur initialisé une fois : même seed => même population
+        self.rng = np.random.default_rng(seed)
+
+    def _tirer_parametres(self, n_dut):
+        """Tire les paramètres de chaque DUT et les défauts éventuels."""
+        rng, tol = self.rng, self.tolerances
+        f0 = self.f0 * (1 + tol["f0"] * rng.standard_normal(n_dut))
+        bande = self.bande * (1 + tol["bande"] * rng.standard_normal(n_dut))
+        q = self.q * np.clip(1 + tol["q"] * rng.standard_normal(n_dut), 0.2, None)
+        ondulation = np.clip(self.ondulation + tol["ondulation"] * rng.standard_normal(n_dut), 0.01, None)
+
+        # Quelques pièces défectueuses : filtre entier décalé en fréquence (désaccord global,
+        # ex : mauvais réglage) ou pertes anormales. Le prototype tout-pôles ne permet pas
+        # de désaccorder un seul résonateur.
+        defaut = rng.random(n_dut) < self.taux_defaut
+        type_defaut = rng.integers(0, 2, n_dut)
+        desaccord = defaut & (type_defaut == 0)
+        pertes = defaut & (type_defaut == 1)
+        f0[desaccord] += bande[desaccord] * rng.uniform(0.3, 1.0, desaccord.sum()) * rng.choice([-1, 1], desaccord.sum())
+        q[pertes] *= rng.uniform(0.05, 0.2, pertes.sum())
+
+        return {"f0": f0, "bande": bande, "q": q, "ondulation": ondulation, "defaut": defaut}
+
+    def _poles_tchebychev(self, ondulation):
+        """Pôles du prototype passe-bas de Tchebychev, un jeu par DUT : tableau (n_dut, ordre)."""
+        n = self.ordre
+        eps = np.sqrt(10 ** (ondulation / 10) - 1)
+        a = np.arcsinh(1 / eps) / n
+        theta = (2 * np.arange(1, n + 1) - 1) * np.pi / (2 * n)
+        poles = (-np.sinh(a)[:, None] * np.sin(theta) + 1j * np.cosh(a)[:, None] * np.cos(theta))
+        # Gain pour avoir |H| = 1 au sommet de l'ondulation
+        gain = np.prod(-poles, axis=1)
+        if n % 2 == 0:
+            gain = gain / np.sqrt(1 + eps ** 2)
+        return poles, gain
+
+    def generer(self, n_dut, start, stop, points, complexe=False):
+        """
+        Renvoie (Trace 2D de forme (n_dut, points), paramètres tirés de chaque DUT).
+        Les valeurs sont en dB, ou en complexe (S21) si complexe=True.
+        """
+        if start <= 0 or stop <= start:
+            # f0 / f diverge au point DC : le modèle passe-bande demande 0 < start < stop
+            raise ValueError("Il faut 0 < start < stop pour simuler un filtre passe-bande.")
+        params = self._tirer_parametres(int(n_dut))
+        freqs = np.linspace(start, stop, int(points))
+        f0 = params["f0"][:, None]
+        fbw = (params["bande"] / params["f0"])[:, None]
+
+        # Transformation passe-bas → passe-bande, les pertes des résonateurs
+        # décalent la variable de Laplace de 1/(Q·FBW)
+        omega = (freqs / f0 - f0 / freqs) / fbw
+        s = 1 / (params["q"][:, None] * fbw) + 1j * omega
+
+        poles, gain = self._poles_tchebychev(params["ondulation"])
+        s21 = np.broadcast_to(gain[:, None], s.shape).astype(np.complex128)
+        for k in range(self.ordre):
+            s21 /= s - poles[:, k:k + 1]
+
+        # Bruit de trace (amplitude et phase) puis plancher de bruit de l'analyseur
+        taille = s21.shape
+        s21 *= 10 ** (self.bruit_db * self.rng.standard_normal(taille) / 20)
+        s21 *= np.exp(1j * np.deg2rad(self.bruit_db * 7 * self.rng.standard_normal(taille)))
+        plancher = 10 ** (self.plancher_db / 20) / np.sqrt(2)
+        s21 += plancher * (self.rng.standard_normal(taille) + 1j * self.rng.standard_normal(taille))
+
+        trace = Trace.lineaire(start, stop, s21, param_S="S21", unite="")
+        return (trace if complexe else trace.en_db()), params
 
 
 class InstrumentManager:
@@ -97,14 +193,15 @@ class InstrumentManager:
         pass
 
 
-manager = InstrumentManager("instrument.yaml")
-# On crée un instrument simulé à partir du YAML
-instr = manager.get_instrument("TCPIP::localhost::INSTR", simulate=True)
-instr.set_parameter("power", -5)
-# On récupère une courbe simulée de mesure
-courbe = instr.measure()
+if __name__ == "__main__":
+    manager = InstrumentManager("Simulation.yaml")
+    # On crée un instrument simulé à partir du YAML
+    instr = manager.get_instrument("TCPIP::localhost::INSTR", simulate=True)
+    instr.set_parameter("power", -5)
+    # On récupère une courbe simulée de mesure
+    courbe = instr.measure()
 
-# Affichage des résultats simulés
-print("Paramètre mesuré :", courbe["parameter"])
-print("Nombre de points :", len(courbe["frequencies"]))
-print("Premier point :", courbe["frequencies"][0], courbe["values"][0])
+    # Affichage des résultats simulés
+    print("Paramètre mesuré :", courbe.param_S)
+    print("Nombre de points :", len(courbe))
+    print("Premier point :", courbe.freqs[0], courbe.valeurs[0])
@@ -1,6 +1,6 @@
 from tracer_courbes import TracerCourbes
 from PDF import Creation_PDF
-from gabarit import Gabarit
+from gabarit import GabaritLineaire
 from ARV_S2VNA import ARV_S2VNA
 from resultat_arv import ResultatARV
 from mesure import Mesure_ARV, S11Mesure, DeltaBPMeasure, DeltaBRMeasure
@@ -26,11 +26,9 @@ if fichier_sur_instrument is None:
     print("Erreur lors de la sauvegarde des mesures sur l'instrument.")
     exit(1)
 
-# 3. Création des gabarits pour définir les zones de tolérance
-gabarit1 = Gabarit(freq_min=0.0, freq_max=2.8e9, att_min=-30, att_max=10.0)
-gabarit2 = Gabarit(freq_min=3.2e9, freq_max=5.5e9, att_min=-80, att_max=-5)
-gabarit3 = Gabarit(freq_min=5.90e9, freq_max=9.0e9, att_min=-30, att_max=10.0)
-liste_gabarit = [gabarit1, gabarit2, gabarit3]
+# 3. Chargement du gabarit (limites haute et basse) depuis Gabarits.yaml
+gabarits = GabaritLineaire.depuis_yaml("Gabarits.yaml")
+liste_gabarit = [gabarits["filtre_passe_bande"]]
 
 # 4. Tracé de la courbe mesurée avec les gabarits sur le graphe
 chemin_local_fichier = f"E:/BUT_GE2I/SDK_SAE/mesures/{nom_fichier}.csv"
@@ -53,12 +51,7 @@ pdf.ln(10)  # Saut de ligne vertical
 pdf.multi_cell(0, 10, "Rapport de Mesures Hyperfréquences :\n------------------------", align='C')
 
 # Ajout des infos des gabarits utilisés dans le rapport
-pdf.ajouter_texte(
-    f"Gabarits appliqués :\n"
-    f"- [{gabarit1.freq_min/1e9:.1f} GHz – {gabarit1.freq_max/1e9:.1f} GHz] : {gabarit1.att_min} à {gabarit1.att_max} dB\n"
-    f"- [{gabarit2.freq_min/1e9:.1f} GHz – {gabarit2.freq_max/1e9:.1f} GHz] : {gabarit2.att_min} à {gabarit2.att_max} dB\n"
-    f"- [{gabarit3.freq_min/1e9:.1f} GHz – {gabarit3.freq_max/1e9:.1f} GHz] : {gabarit3.att_min} à {gabarit3.att_max} dB\n"
-)
+pdf.ajouter_texte("Gabarits appliqués :\n" + "".join(g.texte() for g in liste_gabarit))
 pdf.ajouter_courbe(tracer, f"Courbe {param_S} avec Gabarit")
 
 # 6. Vérification de la conformité de la mesure au gabarit
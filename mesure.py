@@ -1,6 +1,7 @@
 from SAE_POO import Mesure
 from ARV_S2VNA import ARV_S2VNA
 import os
+import math
 import time
 
 class Mesure_ARV(Mesure):
@@ -9,6 +10,15 @@ class Mesure_ARV(Mesure):
         super().__init__(instrument)
         self.name = name      # Nom de la mesure (ex: S11, S21…)
         self.unit = unit      # Unité de mesure (ex: dB, MHz…)
+        # True quand un PlanMesure a déjà réglé l'ARV (et fait le balayage partagé si besoin)
+        self.preconfigure = False
+
+    def selectionner_parametre_S(self, param_S):
+        """Sélectionne le paramètre S, sauf si le plan de mesure l'a déjà fait."""
+        if self.preconfigure:
+            return
+        self.instrument.set_parametre_S(param_S)
+        time.sleep(0.2)
 
     def marker_y(self):
         """Lit la valeur du marqueur """
@@ -72,8 +82,7 @@ class S11Mesure(Mesure_ARV):
 
     def do_mesures(self):
         print(self.instrument.query("*IDN?"))  # Vérifie la connexion
-        self.instrument.set_parametre_S("S11")  # Sélectionne S11
-        time.sleep(0.2)
+        self.selectionner_parametre_S("S11")  # Sélectionne S11
 
         # Cherche le minimum (le point le plus bas de la courbe)
         self.instrument.write("CALC:MARK1:FUNC:TYPE MIN")
@@ -91,18 +100,19 @@ class FCS21MaxMeasure(Mesure_ARV):
     def do_mesures(self):
         print(self.instrument.query("*IDN?"))
         try:
-            self.instrument.set_parametre_S("S21")
-            time.sleep(0.2)
-            self.instrument.device.write("CALC:PAR1:DEF S21")
-            print("Paramètre S21 défini.")
+            if not self.preconfigure:
+                self.selectionner_parametre_S("S21")
+                self.instrument.device.write("CALC:PAR1:DEF S21")
+                print("Paramètre S21 défini.")
 
             # Active le marqueur et cherche le maximum
             self.instrument.device.write("CALC:MARK1 ON")
             self.instrument.device.write("CALC:MARK1:FUNC:TYPE MAX")
 
-            # Lance la mesure et attend la fin
-            self.instrument.device.write("INIT:IMM")
-            self.instrument.device.query("*OPC?")
+            # Lance la mesure et attend la fin (sauf si le balayage est partagé par le plan)
+            if not self.preconfigure:
+                self.instrument.device.write("INIT:IMM")
+                self.instrument.device.query("*OPC?")
 
             # Récupère la fréquence du marqueur
             f0_hz = self.marker_x_hz()
@@ -124,8 +134,7 @@ class DeltaBPMeasure(Mesure_ARV):
 
     def do_mesures(self):
         print(self.instrument.query("*IDN?"))
-        self.instrument.set_parametre_S("S21")
-        time.sleep(0.2)
+        self.selectionner_parametre_S("S21")
 
         # Réglage du mode "bande passante"
         self.instrument.device.write("CALC:MARK:BWID ON")
@@ -149,13 +158,25 @@ class DeltaBPMeasure(Mesure_ARV):
 
 class DeltaBRMeasure(Mesure_ARV):
     # Sert à mesurer la bande à -20 dB (réjection)
-    def __init__(self, instrument):
+    def __init__(self, instrument, moyenne=None):
         super().__init__(instrument, name="deltaBR(MHZ)", unit="MHz")
+        # Fonction optionnelle qui renvoie le moyennage côté PC de S21 (résultat de
+        # ARV_S2VNA.mesure_moyennee) : partagé avec les autres mesures, il n'est fait qu'une fois
+        self.moyenne = moyenne
 
     def do_mesures(self):
         print(self.instrument.query("*IDN?"))
-        self.instrument.set_parametre_S("S21")
-        time.sleep(0.2)
+        self.selectionner_parametre_S("S21")
+
+        # Moyennage côté PC : la bande est calculée sur la moyenne, sans les marqueurs
+        if self.moyenne is not None:
+            resultat = self.moyenne()
+            if resultat is None:
+                return {"name": self.name, "value": None, "unit": self.unit}
+            f_bas, f_haut = resultat["trace"].bande(20.0)
+            bw_hz = f_haut - f_bas
+            # NaN si un bord de bande sort de la plage mesurée
+            return {"name": self.name, "value": None if math.isnan(bw_hz) else bw_hz / 1e6, "unit": "MHz"}
 
         # Réglage du mode "bande réjection"
         self.instrument.device.write("CALC:MARK:BWID ON")
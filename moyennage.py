@@ -0,0 +1,143 @@
+import numpy as np
+from trace_arv import Trace
+
+
+class MoyenneConvergente:
+    """
+    Moyennage côté PC, arrêté dès que les grandeurs utiles sont stables.
+    À chaque balayage, la moyenne et la variance complexes sont mises à jour point par
+    point (algorithme de Welford, vectorisé). On calcule ensuite sur la moyenne : le pic,
+    les bords de bande (-3 dB et -20 dB par défaut) et, si un gabarit est fourni, la marge
+    minimale. On s'arrête quand toutes ces grandeurs bougent de moins que la tolérance pendant
+    `n_stable` balayages de suite, et que l'erreur type de la moyenne (tirée de la variance,
+    en dB, moyennée sur la bande passante) reste sous `erreur_type` : deux moyennes proches par hasard
+    ne suffisent pas. Un DUT peu bruité finit en quelques balayages.
+    """
+    # Tolérances par défaut : dB pour les niveaux, marges et l'erreur type, None = un demi-pas de fréquence
+    TOLERANCES = {"pic_db": 0.05, "pic_freq": None, "bande": None, "marge": 0.05, "erreur_type": 0.1}
+
+    def __init__(self, ecarts_db=(3.0, 20.0), gabarit=None, tolerances=None,
+                 min_balayages=2, max_balayages=32, n_stable=2):
+        self.ecarts_db = tuple(ecarts_db)
+        self.gabarit = gabarit
+        self.tolerances = dict(self.TOLERANCES, **(tolerances or {}))
+        self.min_balayages = max(int(min_balayages), 2)
+        self.max_balayages = int(max_balayages)
+        self.n_stable = int(n_stable)
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        """Repart de zéro (nouveau DUT)."""
+        self.n = 0
+        self._modele = None
+        self.moyenne = None
+        self._m2 = None
+        self.metriques = None
+        self._stable = 0
+
+    def ajouter(self, trace):
+        """Ajoute un balayage complexe ; renvoie True si le moyennage a convergé."""
+        x = trace.valeurs
+        self.n += 1
+        if self.moyenne is None:
+            self._modele = trace
+            self.moyenne = np.array(x, dtype=np.complex128)
+            self._m2 = np.zeros(x.shape, dtype=np.float64)
+        else:
+            delta = x - self.moyenne
+            self.moyenne += delta / self.n
+            # Variance complexe : E|x - µ|², mise à jour sans garder les balayages
+            self._m2 += (delta * np.conj(x - self.moyenne)).real
+
+        precedentes, self.metriques = self.metriques, self._calculer_metriques()
+        if precedentes is not None and self._est_stable(precedentes, self.metriques) and self._est_precis():
+            self._stable += 1
+        else:
+            self._stable = 0
+        return self.converge
+
+    @property
+    def converge(self):
+        return self.n >= self.min_balayages and self._stable >= self.n_stable
+
+    @property
+    def variance(self):
+        """Variance complexe par point (E|x - µ|²)."""
+        if self.n < 2:
+            return np.full(self.moyenne.shape, np.nan)
+        return self._m2 / (self.n - 1)
+
+    @property
+    def erreur_type_db(self):
+        """Erreur type de la moyenne par point, en dB : 20/ln(10) · sqrt(variance / n) / |µ|."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 20 / np.log(10) * np.sqrt(self.variance / self.n) / np.abs(self.moyenne)
+
+    def _est_precis(self):
+        # Points à moins du plus petit écart (ex : -3 dB) sous le pic : ceux qui fixent le pic et
+        # la bande passante ; loin dans la réjection, le bruit relatif ne baisse jamais assez
+        module = 20 * np.log10(np.maximum(np.abs(self.moyenne), 1e-300))
+        bande = module >= module.max(axis=-1, keepdims=True) - min(self.ecarts_db)
+        erreur = self.erreur_type_db[bande]
+        return erreur.size > 0 and np.nanmean(erreur) <= self.tolerances["erreur_type"]
+
+    def trace_moyenne(self):
+        """Trace complexe moyennée (même axe de fréquence que les balayages)."""
+        t = self._modele
+        if t.est_lineaire:
+            return Trace.lineaire(t.start, t.stop, self.moyenne, param_S=t.param_S, unite=t.unite,
+                                  horodatage=t.horodatage)
+        return Trace(self.moyenne, freqs=t.freqs, param_S=t.param_S, unite=t.unite, horodatage=t.horodatage)
+
+    def _calculer_metriques(self):
+        """Pic, bords de bande et marge au gabarit calculés sur la moyenne courante."""
+        trace = self.trace_moyenne().en_db()
+        pic_freq, pic_db = trace.pic()
+        metriques = {"pic_freq": pic_freq, "pic_db": pic_db}
+        for ecart in self.ecarts_db:
+            f_bas, f_haut = trace.bande(ecart)
+            metriques[f"bande_{ecart:g}dB_bas"] = f_bas
+            metriques[f"bande_{ecart:g}dB_haut"] = f_haut
+        if self.gabarit is not None:
+            metriques["marge"] = float(np.nanmin(self.gabarit.marges(trace.freqs, trace.valeurs)))
+        return metriques
+
+    def _tolerance(self, cle):
+        if cle.startswith("bande"):
+            tol = self.tolerances["bande"]
+        else:
+            tol = self.tolerances[cle]
+        if tol is None:
+            # Tolérance en fréquence : un demi-pas du balayage
+            t = self._modele
+            tol = 0.5 * (t.stop - t.start) / max(t.npoints - 1, 1)
+        return tol
+
+    def _est_stable(self, avant, apres):
+        for cle, valeur in apres.items():
+            ecart = abs(valeur - avant[cle])
+            # Un bord hors plage (NaN) des deux côtés est considéré comme stable
+            if np.isnan(ecart):
+                if np.isnan(valeur) and np.isnan(avant[cle]):
+                    continue
+                return False
+            if ecart > self._tolerance(cle):
+                return False
+        return True
+
+    def moyenner(self, balayage):
+        """
+        Appelle `balayage()` (qui renvoie une Trace complexe) jusqu'à convergence
+        ou jusqu'à max_balayages. Renvoie un dictionnaire de résultats.
+        """
+        self.reinitialiser()
+        while self.n < self.max_balayages:
+            if self.ajouter(balayage()):
+                break
+        return {
+            "trace": self.trace_moyenne(),
+            "variance": self.variance,
+            "balayages": self.n,
+            "converge": self.converge,
+            "metriques": self.metriques,
+        }
@@ -0,0 +1,271 @@
+import time
+
+
+class MesureFonction:
+    """
+    Adaptateur pour mettre une simple fonction dans un plan de mesure (ex : une méthode
+    de ResultatARV). Même interface que Mesure_ARV : name, unit, preconfigure, do_mesures().
+    """
+    def __init__(self, name, unit, fonction):
+        self.name = name
+        self.unit = unit
+        self.fonction = fonction
+        self.preconfigure = False
+
+    def do_mesures(self):
+        return {"name": self.name, "value": self.fonction(), "unit": self.unit}
+
+
+class EtapeMesure:
+    """
+    Une mesure du plan et la configuration de l'ARV dont elle a besoin.
+    Un champ à None signifie « peu importe » : l'étape se contente du réglage en cours.
+    balayage=True si la mesure lit des données (trace ou marqueur) et demande donc un balayage
+    neuf après réglage : le plan balaie en déclenchement bus, les données restent figées
+    entre deux balayages. Les lectures de réglages n'en ont pas besoin.
+    Un span à None avec une fréquence centrale garde l'étendue de balayage en cours.
+    initial=True : l'étape lit l'état de l'ARV tel qu'il est avant le plan (ex : réglages
+    après preset) ; elle passe avant toute reconfiguration et ne demande aucun réglage.
+    """
+    def __init__(self, mesure, param_S=None, freq=None, span=None, calibrage=None, mode=None, balayage=False,
+                 initial=False):
+        self.mesure = mesure          # objet Mesure_ARV (S11Mesure, DeltaBPMeasure, ...) ou MesureFonction
+        self.param_S = param_S        # S11, S21, ...
+        self.freq = freq              # fréquence centrale (Hz)
+        self.span = span              # étendue du balayage (Hz)
+        self.calibrage = calibrage    # méthode de calibrage (voir ARV_S2VNA.set_calibrage)
+        self.mode = mode              # mode de lecture (marqueur min/max, bande...), pour information
+        self.balayage = balayage
+        self.initial = initial
+        if freq is None and span is not None:
+            raise ValueError(f"{self.nom} : un span demande une fréquence centrale.")
+        if initial and (param_S, freq, calibrage) != (None, None, None):
+            raise ValueError(f"{self.nom} : une étape initiale lit l'état de départ, sans réglage.")
+
+    @property
+    def nom(self):
+        return getattr(self.mesure, "name", None) or self.mesure.__class__.__name__
+
+    @property
+    def plan_frequence(self):
+        return None if self.freq is None else (self.freq, self.span)
+
+    def configuration(self):
+        """Configuration demandée : (calibrage, plan de fréquence, paramètre S)."""
+        return (self.calibrage, self.plan_frequence, self.param_S)
+
+
+def _compatibles(a, b):
+    # Deux configurations sont compatibles si chaque champ est égal ou laissé libre (None)
+    return all(x is None or y is None or x == y for x, y in zip(a, b))
+
+
+def _fusionner(a, b):
+    return tuple(x if x is not None else y for x, y in zip(a, b))
+
+
+class PlanMesure:
+    """
+    Plan de mesure déclaratif et ordonnanceur.
+    Les étapes compatibles (mêmes réglages, ou réglages laissés libres) sont regroupées et
+    partagent au plus un balayage ; les groupes sont ensuite ordonnés pour limiter les
+    reconfigurations coûteuses (calibrage, plan de fréquence, paramètre S).
+    """
+    # Coûts estimés (s) de chaque opération, remplacés par les durées mesurées après exécution
+    COUTS = {"calibrage": 12.0, "frequence": 0.5, "param_S": 0.3, "balayage": 0.5, "mesure": 1.0}
+    CHAMPS = ("calibrage", "frequence", "param_S")
+
+    def __init__(self, etapes, couts=None):
+        self.etapes = list(etapes)
+        self.couts = dict(self.COUTS, **(couts or {}))
+        self.durees = {cle: [] for cle in self.COUTS}   # durées réellement mesurées
+        self.duree_totale = None
+        self._declenchement = None   # état de déclenchement à restaurer après exécution
+
+    @classmethod
+    def depuis_liste(cls, instrument, liste, types_mesure, **options):
+        """
+        Construit un plan depuis une liste de dictionnaires (ex : lue dans un YAML) :
+        {"mesure": "DeltaBP", "param_S": "S21", "freq": 868e6, "span": 50e6, "calibrage": "solt2"}.
+        `types_mesure` associe le nom de la mesure à sa classe (ex : {"DeltaBP": DeltaBPMeasure}).
+        """
+        etapes = []
+        for d in liste:
+            d = dict(d)
+            classe = types_mesure[d.pop("mesure")]
+            etapes.append(EtapeMesure(classe(instrument), **d))
+        return cls(etapes, **options)
+
+    def _regrouper(self):
+        """
+        Chaque étape rejoint le premier groupe compatible, sinon elle ouvre un nouveau groupe.
+        Les étapes initiales sont laissées à part (voir ordonner).
+        """
+        groupes = []
+        for etape in self.etapes:
+            if etape.initial:
+                continue
+            config = etape.configuration()
+            for i, (config_groupe, etapes) in enumerate(groupes):
+                if _compatibles(config, config_groupe):
+                    groupes[i] = (_fusionner(config_groupe, config), etapes + [etape])
+                    break
+            else:
+                groupes.append((config, [etape]))
+        return groupes
+
+    def _cout_reglage(self, courant, config, couts):
+        """Coût (s) pour passer de la configuration courante à `config` (None = rien à régler)."""
+        return sum(couts[cle] for cle, n, c in zip(self.CHAMPS, config, courant) if n is not None and n != c)
+
+    def ordonner(self, couts=None):
+        """
+        Renvoie les groupes d'étapes dans l'ordre d'exécution : liste de (configuration, étapes).
+        Ordre glouton : à chaque pas, on prend le groupe qui ne change pas de calibrage si possible,
+        puis le moins coûteux à régler (fréquence, paramètre S) depuis la configuration courante ;
+        à égalité, le premier dans l'ordre du plan. Le premier calibrage du plan est compté
+        comme déjà fait (il faudra le faire de toute façon). Les groupes d'un même calibrage
+        passent donc tous avant d'en changer ; le reste n'est pas forcément l'optimum.
+        Les étapes initiales forment un premier groupe, exécuté avant tout réglage.
+        """
+        couts = couts or self.couts
+        restants = self._regrouper()
+        initiales = [e for e in self.etapes if e.initial]
+        ordre = [((None, None, None), initiales)] if initiales else []
+        premier_cal = next((e.calibrage for e in self.etapes if e.calibrage is not None), None)
+        courant = (premier_cal, None, None)
+
+        def _cle(k):
+            config = restants[k][0]
+            change_cal = config[0] is not None and config[0] != courant[0]
+            return change_cal, self._cout_reglage(courant, (None,) + config[1:], couts)
+
+        while restants:
+            config, etapes = restants.pop(min(range(len(restants)), key=_cle))
+            courant = _fusionner(config, courant)
+            ordre.append((config, etapes))
+        return ordre
+
+    def _compter(self, groupes, toujours_param=False):
+        """
+        Nombre de chaque opération pour une suite de (configuration, étapes).
+        toujours_param=True : le paramètre S est resélectionné à chaque groupe qui en demande un,
+        même s'il n'a pas changé (c'est ce que faisait chaque mesure exécutée seule).
+        """
+        nombres = {"calibrage": 0, "frequence": 0, "param_S": 0, "balayage": 0, "mesure": 0}
+        courant = (None, None, None)
+        for config, etapes in groupes:
+            for cle, n, c in zip(self.CHAMPS, config, courant):
+                if n is not None and (n != c or (toujours_param and cle == "param_S")):
+                    nombres[cle] += 1
+            courant = _fusionner(config, courant)
+            nombres["balayage"] += any(e.balayage for e in etapes)
+            nombres["mesure"] += len(etapes)
+        return nombres
+
+    def _cout(self, nombres, couts):
+        return sum(nombres[cle] * couts[cle] for cle in nombres)
+
+    def prevision(self, couts=None):
+        """
+        Temps prévu (s) dans l'ordre d'origine et avec l'ordonnanceur.
+        L'ordre d'origine reprend l'ancienne séquence : chaque mesure, l'une après l'autre,
+        resélectionne son paramètre S et fait son propre balayage si elle en a besoin.
+        """
+        couts = couts or self.couts
+        naif = self._compter([(e.configuration(), [e]) for e in self.etapes], toujours_param=True)
+        ordonne = self._compter(self.ordonner(couts))
+        t_naif, t_ordonne = self._cout(naif, couts), self._cout(ordonne, couts)
+        return {"naif": t_naif, "ordonne": t_ordonne, "gain": t_naif - t_ordonne,
+                "operations_naif": naif, "operations_ordonne": ordonne}
+
+    def _chrono(self, cle, fonction, *args):
+        debut = time.perf_counter()
+        fonction(*args)
+        self.durees[cle].append(time.perf_counter() - debut)
+
+    @staticmethod
+    def _regler_frequence(instrument, freq, span):
+        if span is None:
+            instrument.write(f"SENS:FREQ:CENT {freq}")
+        else:
+            instrument.set_frequence(freq, span)
+
+    def executer(self, instrument):
+        """
+        Exécute le plan sur l'ARV : reconfiguration uniquement quand elle change, au plus
+        un balayage par groupe, puis toutes les mesures du groupe sur ce balayage.
+        Les mesures sont lancées avec preconfigure=True : elles ne touchent pas aux réglages,
+        ce qui garde exacte la configuration courante suivie par le plan.
+        Dès le premier balayage, l'ARV passe en déclenchement bus (balayage unique complet,
+        données figées jusqu'au suivant) ; l'état de déclenchement d'origine est restauré à la fin.
+        Renvoie les résultats au même format que ResultatARV.mesurer.
+        """
+        self._declenchement = None
+        try:
+            return self._executer(instrument)
+        finally:
+            if self._declenchement is not None:
+                instrument.set_declenchement(self._declenchement)
+                self._declenchement = None
+
+    def _executer(self, instrument):
+        resultats = {}
+        courant = (None, None, None)
+        self.durees = {cle: [] for cle in self.COUTS}
+        debut = time.perf_counter()
+
+        for config, etapes in self.ordonner():
+            cal, freq, param = config
+            if freq is not None and freq != courant[1]:
+                self._chrono("frequence", self._regler_frequence, instrument, *freq)
+            if cal is not None and cal != courant[0]:
+                self._chrono("calibrage", instrument.set_calibrage, cal)
+            if param is not None and param != courant[2]:
+                self._chrono("param_S", instrument.set_parametre_S, param)
+            courant = _fusionner(config, courant)
+
+            # Un seul balayage partagé, seulement si une mesure du groupe lit la trace
+            if any(e.balayage for e in etapes):
+                self._chrono("balayage", self._balayage, instrument)
+            for etape in etapes:
+                etape.mesure.preconfigure = True
+                debut_mesure = time.perf_counter()
+                try:
+                    res = etape.mesure.do_mesures()
+                    resultats[res["name"]] = {"value": res["value"], "unit": res["unit"]}
+                except Exception as e:
+                    print(f"Erreur pendant la mesure {etape.nom} : {e}")
+                    resultats[etape.nom] = {"value": None, "unit": ""}
+                finally:
+                    etape.mesure.preconfigure = False
+                    self.durees["mesure"].append(time.perf_counter() - debut_mesure)
+
+        self.duree_totale = time.perf_counter() - debut
+        return resultats
+
+    def _balayage(self, instrument):
+        # Balayage unique déclenché par le bus, attendu par *OPC? (comme ARV_S2VNA.balayage_complexe)
+        if self._declenchement is None:
+            self._declenchement = instrument.get_declenchement()
+            instrument.set_balayage_continu(True)
+        instrument.write("TRIG:SING")
+        instrument.query("*OPC?")
+
+    def rapport(self):
+        """
+        Gain prévu (coûts estimés) et gain réel : le temps mesuré est comparé à l'ordre
+        d'origine réestimé avec les durées réellement mesurées pour chaque opération.
+        """
+        prevu = self.prevision()
+        ops_naif, ops = prevu["operations_naif"], prevu["operations_ordonne"]
+        lignes = [f"Plan de mesure : {len(self.etapes)} mesures, {ops['balayage']} balayages "
+                  f"(ordre d'origine : {ops_naif['balayage']}), {ops['param_S']} changements de paramètre S "
+                  f"(ordre d'origine : {ops_naif['param_S']})",
+                  f"- prévu : {prevu['naif']:.1f} s → {prevu['ordonne']:.1f} s (gain {prevu['gain']:.1f} s)"]
+        if self.duree_totale is not None:
+            couts_reels = {cle: (sum(d) / len(d) if d else self.couts[cle]) for cle, d in self.durees.items()}
+            naif_reel = self.prevision(couts_reels)["naif"]
+            lignes.append(f"- réel : {self.duree_totale:.1f} s, ordre d'origine estimé à {naif_reel:.1f} s "
+                          f"(gain {naif_reel - self.duree_totale:.1f} s)")
+        return "\n".join(lignes)
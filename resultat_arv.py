@@ -1,10 +1,21 @@
 import pyvisa
+import math
 import time
 from SAE_POO import Resultat
+from plan_mesure import PlanMesure, EtapeMesure, MesureFonction
+from analyse_complexe import AnalyseComplexe
 
 class ResultatARV(Resultat):
-    def __init__(self, freq_cible):
+    def __init__(self, freq_cible, moyennage=None, bande_nominale=None, gabarit=None):
         super().__init__()
+        # MoyenneConvergente optionnelle : moyennage côté PC au lieu d'un moyennage fixe sur l'ARV
+        self.moyennage = moyennage
+        # Bande passante spécifiée, pour l'ondulation et la planéité du temps de groupe :
+        # étendue de la limite basse du gabarit, sinon freq_cible ± bande_nominale/2 (Hz)
+        self.bande_nominale = bande_nominale
+        self.gabarit = gabarit
+        self.analyse = None  # AnalyseComplexe de la dernière trace S21 (phase, temps de groupe...)
+        self._moyenne = None  # résultat du moyennage côté PC de S21 pour le DUT en cours
 
         # Import de la classe de l’instrument (analyseur ARV)
         from ARV_S2VNA import ARV_S2VNA
@@ -23,9 +34,28 @@ class ResultatARV(Resultat):
             S11Mesure(self.instrument),
             FCS21MaxMeasure(self.instrument),
             DeltaBPMeasure(self.instrument),
-            DeltaBRMeasure(self.instrument)
+            DeltaBRMeasure(self.instrument, moyenne=self.moyenne_s21 if moyennage is not None else None)
         ]
 
+        # Plan de mesure. Les réglages de départ (span et centre après preset) sont lus avant
+        # tout réglage ; toutes les autres mesures se font centrées sur freq_cible, et les
+        # mesures S21 (perte d'insertion comprise) partagent le même réglage et le même balayage
+        self.plan = PlanMesure([
+            EtapeMesure(MesureFonction("bande_passante", "Hz", lambda: self.get_bande_passante()[0]),
+                        mode="reglage", initial=True),
+            EtapeMesure(MesureFonction("centre_freq", "Hz", self.get_frequence),
+                        mode="reglage", initial=True),
+            # Avec le moyennage côté PC, la perte d'insertion fait ses propres balayages
+            EtapeMesure(MesureFonction("perte_insertion", "dB", lambda: self.get_perte_insertion(configurer=False)),
+                        param_S="S21", freq=freq_cible, mode="trace", balayage=moyennage is None),
+            EtapeMesure(MesureFonction("frequence", "Hz", self.get_frequence), freq=freq_cible, mode="reglage"),
+            # En déclenchement bus, les données S11 n'existent qu'après un balayage sur S11
+            EtapeMesure(self.liste_mesures[0], param_S="S11", freq=freq_cible, mode="marqueur_min", balayage=True),
+            EtapeMesure(self.liste_mesures[1], param_S="S21", freq=freq_cible, mode="marqueur_max", balayage=True),
+            EtapeMesure(self.liste_mesures[2], param_S="S21", freq=freq_cible, mode="bande"),
+            EtapeMesure(self.liste_mesures[3], param_S="S21", freq=freq_cible, mode="bande"),
+        ])
+
     def _envoyer_commande(self, commande):
         """Envoie une commande à l’appareil (sans lire de réponse)."""
         try:
@@ -55,37 +85,71 @@ class ResultatARV(Resultat):
             span, centre = None, None
         return span, centre
 
-    def get_perte_insertion(self):
-        """Mesure la perte d’insertion (S21 en dB) à la fréquence choisie.Cela correspond à la perte du signal à travers le filtre."""
+    def moyenne_s21(self):
+        """
+        Moyennage côté PC de S21, fait une seule fois par DUT : la perte d'insertion et la
+        bande à -20 dB utilisent la même trace moyennée.
+        """
+        if self._moyenne is None:
+            self._moyenne = self.instrument.mesure_moyennee(self.moyennage, "S21")
+        return self._moyenne
+
+    def get_perte_insertion(self, configurer=True):
+        """Mesure la perte d’insertion (dB, positive = -S21 en dB) à la fréquence choisie.Cela correspond à la perte du signal à travers le filtre.
+        Même convention que AnalyseComplexe.bande_passante et perte_a : 1.5 veut dire S21 = -1.5 dB.
+        configurer=False : S21 et la fréquence centrale ont déjà été réglés (plan de mesure)."""
         try:
-            # Sélectionne le paramètre S21 sur l’appareil
-            self._envoyer_commande("CALC:PAR:DEF S21, S21")
-            self._envoyer_commande("CALC:PAR:SEL S21")
-
-            # Définit la fréquence de mesure
-            self._envoyer_commande(f"SENS:FREQ:CENT {self.freq_cible}")
-
-            # Demande les données S21 au format brut
-            magnitude_str = self._safe_query("CALC:DATA:FDAT?", delay=0.5)
-            if not magnitude_str:
-                return None
-
-            # Réponse = une série de valeurs : re0, im0, re1, im1, ...
-            valeurs = list(map(float, magnitude_str.strip().split(',')))
-            if len(valeurs) < 2:
+            if configurer:
+                # Sélectionne le paramètre S21 sur l’appareil
+                self._envoyer_commande("CALC:PAR:DEF S21, S21")
+                self._envoyer_commande("CALC:PAR:SEL S21")
+
+                # Définit la fréquence de mesure
+                self._envoyer_commande(f"SENS:FREQ:CENT {self.freq_cible}")
+                # Nouveau réglage : un moyennage précédent ne correspond plus
+                self._moyenne = None
+
+            if self.moyennage is not None:
+                # Moyennage côté PC jusqu'à stabilité, puis analyse de la moyenne
+                resultat = self.moyenne_s21()
+                if resultat is None:
+                    return None
+                self.analyse = AnalyseComplexe(resultat["trace"])
+            elif configurer:
+                # Balayage unique (attendu par *OPC?), puis lecture complexe sur le plan de
+                # fréquence lu sur l'ARV après réglage : pas de données périmées
+                etat = self.instrument.get_declenchement()
+                self.instrument.set_balayage_continu(True)
+                try:
+                    self.analyse = AnalyseComplexe(self.instrument.balayage_complexe(param_S="S21"))
+                finally:
+                    self.instrument.set_declenchement(etat)
+            else:
+                # Le plan de mesure vient de faire le balayage : lecture seule
+                self.analyse = AnalyseComplexe(self.instrument.lire_trace_complexe(param_S="S21"))
+
+            trace = self.analyse.trace
+            # Trace inexploitable (moins de deux points, span nul) : pas de valeur plutôt que NaN
+            if len(trace) < 2 or trace.stop <= trace.start:
                 return None
-
-            re, im = valeurs[0], valeurs[1]
-
-            # Calcule la magnitude en dB : 20 * log10(|S21|)
-            import math
-            mag_dB = 20 * math.log10((re**2 + im**2)**0.5)
-            return mag_dB
+            # Perte à la fréquence choisie (interpolée sur la trace complète)
+            perte = self.analyse.perte_a(self.freq_cible)
+            return perte if math.isfinite(perte) else None
 
         except Exception as e:
             print(f"Erreur pendant la mesure de la perte d’insertion : {e}")
             return None
 
+    def bande_specifiee(self):
+        """Bande passante spécifiée (f_min, f_max) en Hz, ou None si aucune n'est configurée."""
+        if self.gabarit is not None:
+            bande = self.gabarit.bande_utile()
+            if bande is not None:
+                return bande
+        if self.bande_nominale:
+            return self.freq_cible - self.bande_nominale / 2, self.freq_cible + self.bande_nominale / 2
+        return None
+
     def get_frequence(self):
         """Récupère la fréquence centrale actuelle de l’appareil."""
         freq_str = self._safe_query("SENS:FREQ:CENT?")
@@ -96,24 +160,23 @@ class ResultatARV(Resultat):
 
     def mesurer(self):
         """Fait toutes les mesures (bande passante, fréquence, pertes, etc.) et renvoie les résultats dans un dictionnaire clair."""
-        resultats = {}
-
-        # Mesures de base (faites directement par SCPI)
-        bp, cf = self.get_bande_passante()
-        pi = self.get_perte_insertion()
-        f = self.get_frequence()
-        resultats["bande_passante"] = {"value": bp, "unit": "Hz"}
-        resultats["centre_freq"] = {"value": cf, "unit": "Hz"}
-        resultats["perte_insertion"] = {"value": pi, "unit": "dB"}
-        resultats["frequence"] = {"value": f, "unit": "Hz"}
-
-        # Mesures avancées (faites par les autres classes de mesure)
-        for mesure in self.liste_mesures:
+        # Toutes les mesures (réglages lus par SCPI, perte d'insertion, marqueurs), ordonnées par le plan
+        self.analyse = None
+        self._moyenne = None  # nouveau DUT : le moyennage sera refait une fois
+        resultats = self.plan.executer(self.instrument)
+        print(self.plan.rapport())
+        pi = resultats["perte_insertion"]["value"]
+
+        # Ondulation et planéité du temps de groupe sur la bande passante spécifiée (même trace,
+        # pas de balayage en plus). La bande à -3 dB de la mesure ne convient pas : elle englobe
+        # les flancs et les pics de temps de groupe aux bords de bande.
+        bande_spec = self.bande_specifiee()
+        if pi is not None and self.analyse is not None and bande_spec is not None:
             try:
-                res = mesure.do_mesures()
-                resultats[res['name']] = {"value": res["value"], "unit": res["unit"]}
-            except Exception as e:
-                print(f"Erreur pendant la mesure {mesure.__class__.__name__} : {e}")
-                resultats[mesure.__class__.__name__] = {"value": None, "unit": ""}
+                bande = self.analyse.bande_passante(*bande_spec, ouverture=3)
+                resultats["ondulation"] = {"value": float(bande["ondulation"]), "unit": "dB"}
+                resultats["variation_tdg"] = {"value": float(bande["tdg_variation"]) * 1e9, "unit": "ns"}
+            except ValueError as e:
+                print(f"Bande passante spécifiée hors du balayage : {e}")
 
         return resultats
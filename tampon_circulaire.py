@@ -0,0 +1,170 @@
+import os
+import time
+import numpy as np
+from trace_arv import Trace
+
+
+class TamponCirculaire:
+    """
+    Tampon circulaire sur disque (np.memmap) pour la surveillance longue durée.
+    Le fichier contient un en-tête, puis pour chaque emplacement : l'horodatage,
+    les métriques du balayage (fréquence et niveau du pic, bande à -3 dB) et la
+    courbe en float32. La mémoire utilisée reste constante quelle que soit la durée,
+    et un autre processus peut ouvrir le même fichier en lecture pendant la mesure.
+    Chaque emplacement a un numéro de séquence (principe du seqlock) : impair pendant
+    l'écriture, pair une fois l'emplacement complet. Un lecteur relit l'emplacement si
+    le numéro a changé pendant sa copie : il ne renvoie jamais une courbe à moitié écrite.
+    """
+    MAGIC = b"ARVRING2"
+    ESSAIS_LECTURE = 5
+    ENTETE = np.dtype([
+        ("magic", "S8"),
+        ("capacite", "<i8"),
+        ("npoints", "<i8"),
+        ("compteur", "<i8"),       # nombre total de balayages écrits depuis la création
+        ("start", "<f8"),
+        ("stop", "<f8"),
+        ("ref_pic_freq", "<f8"),   # fréquence du pic du premier balayage (référence de dérive)
+    ])
+    TAILLE_ENTETE = 128
+
+    def __init__(self, chemin, capacite=None, npoints=None, start=0.0, stop=0.0, lecture_seule=False):
+        self.chemin = chemin
+        if capacite is not None:
+            # Création d'un nouveau tampon : taille fixée une fois pour toutes
+            self._creer(int(capacite), int(npoints))
+            self.entete = np.memmap(chemin, dtype=self.ENTETE, mode="r+", shape=(1,))
+            self.entete["magic"] = self.MAGIC
+            self.entete["capacite"] = capacite
+            self.entete["npoints"] = npoints
+            self.entete["compteur"] = 0
+            self.entete["start"] = start
+            self.entete["stop"] = stop
+            self.entete["ref_pic_freq"] = np.nan
+            self.entete.flush()
+        else:
+            self.entete = np.memmap(chemin, dtype=self.ENTETE, mode="r" if lecture_seule else "r+", shape=(1,))
+            if self.entete["magic"][0] != self.MAGIC:
+                raise ValueError(f"Fichier de tampon invalide : {chemin}")
+
+        self.capacite = int(self.entete["capacite"][0])
+        self.npoints = int(self.entete["npoints"][0])
+        mode = "r" if lecture_seule else "r+"
+        offset = self.TAILLE_ENTETE
+        # Numéros de séquence, horodatages, une colonne par métrique, puis le bloc des courbes
+        self.sequences = np.memmap(chemin, dtype="<i8", mode=mode, offset=offset, shape=(self.capacite,))
+        offset += 8 * self.capacite
+        self.horodatages = np.memmap(chemin, dtype="<f8", mode=mode, offset=offset, shape=(self.capacite,))
+        offset += 8 * self.capacite
+        self.metriques_brutes = np.memmap(chemin, dtype="<f8", mode=mode, offset=offset, shape=(self.capacite, 4))
+        offset += 8 * 4 * self.capacite
+        self.courbes = np.memmap(chemin, dtype="<f4", mode=mode, offset=offset,
+                                 shape=(self.capacite, self.npoints))
+
+    def _creer(self, capacite, npoints):
+        """Réserve le fichier à sa taille finale."""
+        taille = self.TAILLE_ENTETE + 8 * capacite + 8 * capacite + 8 * 4 * capacite + 4 * capacite * npoints
+        with open(self.chemin, "wb") as f:
+            f.truncate(taille)
+
+    @classmethod
+    def ouvrir(cls, chemin):
+        """Ouvre un tampon existant en lecture seule (ex : depuis un autre processus)."""
+        return cls(chemin, lecture_seule=True)
+
+    @property
+    def compteur(self):
+        return int(self.entete["compteur"][0])
+
+    def __len__(self):
+        return min(self.compteur, self.capacite)
+
+    def ajouter(self, trace, horodatage=None):
+        """Écrit un balayage à la place du plus ancien et met à jour ses métriques."""
+        valeurs = trace.en_db().valeurs
+        if len(valeurs) != self.npoints:
+            raise ValueError(f"La trace a {len(valeurs)} points, le tampon en attend {self.npoints}.")
+        start, stop = self.entete["start"][0], self.entete["stop"][0]
+        pas = abs(stop - start) / max(self.npoints - 1, 1)
+        if abs(trace.start - start) > 1e-6 * pas or abs(trace.stop - stop) > 1e-6 * pas:
+            raise ValueError(f"La trace couvre {trace.start:g} → {trace.stop:g} Hz, "
+                             f"le tampon {start:g} → {stop:g} Hz.")
+
+        n = self.compteur
+        i = n % self.capacite
+        pic_freq, pic_db = trace.pic()
+        f_bas, f_haut = trace.bande(3.0)
+        if n == 0:
+            self.entete["ref_pic_freq"] = pic_freq
+
+        # Numéro impair pendant l'écriture, puis pair : un lecteur qui copie cet emplacement
+        # (le plus ancien une fois le tampon plein) voit que la copie n'est pas cohérente
+        self.sequences[i] = 2 * n + 1
+        self.courbes[i] = valeurs
+        self.metriques_brutes[i] = (pic_freq, pic_db, f_haut - f_bas, pic_freq - self.entete["ref_pic_freq"][0])
+        self.horodatages[i] = time.time() if horodatage is None else horodatage
+        self.sequences[i] = 2 * n + 2
+        self.entete["compteur"] = n + 1
+
+    def flush(self):
+        for m in (self.courbes, self.metriques_brutes, self.horodatages, self.sequences, self.entete):
+            m.flush()
+
+    def _ordre(self, n):
+        """Indices des n derniers emplacements, du plus ancien au plus récent."""
+        total = self.compteur
+        n = min(n, len(self))
+        return np.arange(total - n, total) % self.capacite
+
+    def _copier(self, idx, *tableaux):
+        """
+        Copie les emplacements idx des tableaux donnés, en relisant ceux que l'écrivain a
+        modifiés pendant la copie. Les emplacements toujours incohérents après
+        ESSAIS_LECTURE copies (ou en cours d'écriture) sont écartés.
+        Renvoie (indices gardés, copies).
+        """
+        for _ in range(self.ESSAIS_LECTURE):
+            avant = np.array(self.sequences[idx])
+            copies = [np.array(t[idx]) for t in tableaux]
+            apres = np.array(self.sequences[idx])
+            valide = (avant == apres) & (avant % 2 == 0)
+            if valide.all():
+                break
+        return idx[valide], [c[valide] for c in copies]
+
+    def dernieres(self, n=1):
+        """Renvoie les n derniers balayages sous forme de Trace 2D (et leurs horodatages)."""
+        _, (courbes, horodatages) = self._copier(self._ordre(n), self.courbes, self.horodatages)
+        trace = Trace.lineaire(self.entete["start"][0], self.entete["stop"][0],
+                               np.asarray(courbes, dtype=np.float64))
+        return trace, horodatages
+
+    def metriques(self, fenetre=60):
+        """
+        Métriques glissantes sur les `fenetre` derniers balayages : dérive du pic
+        par rapport au premier balayage, moyenne et écart-type du pic et de la bande.
+        """
+        idx, (m,) = self._copier(self._ordre(fenetre), self.metriques_brutes)
+        if len(idx) == 0:
+            return None
+        return {
+            "balayages": self.compteur,
+            "pic_freq": float(m[-1, 0]),
+            "pic_db": float(m[-1, 1]),
+            "derive_pic": float(m[-1, 3]),
+            "derive_pic_moyenne": float(np.nanmean(m[:, 3])),
+            "pic_db_moyen": float(np.nanmean(m[:, 1])),
+            "pic_db_ecart_type": float(np.nanstd(m[:, 1])),
+            "bande_3db": float(m[-1, 2]),
+            "bande_3db_moyenne": float(np.nanmean(m[:, 2])),
+        }
+
+    def fermer(self):
+        """Vide les écritures sur disque et libère les projections mémoire."""
+        if self.entete.mode != "r":
+            self.flush()
+        self.courbes = self.metriques_brutes = self.horodatages = self.sequences = self.entete = None
+
+    def __repr__(self):
+        return (f"TamponCirculaire({os.path.basename(self.chemin)}, "
+                f"{len(self)}/{self.capacite} balayages × {self.npoints} points)")
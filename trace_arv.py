@@ -0,0 +1,242 @@
+import warnings
+import numpy as np
+from datetime import datetime
+
+
+class Trace:
+    """
+    Courbe mesurée (ou simulée) partagée entre le simulateur, le chargement CSV,
+    l'analyse et le tracé. Les valeurs sont stockées dans un tableau NumPy contigu
+    (float64 pour les valeurs en dB, complex128 pour les données brutes re/im).
+    Pour un balayage linéaire, l'axe des fréquences n'est pas stocké : il est
+    recalculé à partir de start/stop/npoints.
+    Les valeurs peuvent aussi être un lot de courbes (tableau 2D, une ligne par DUT) :
+    la dernière dimension correspond toujours aux fréquences.
+    """
+    __slots__ = ("valeurs", "start", "stop", "npoints", "_freqs", "param_S", "unite", "horodatage")
+
+    def __init__(self, valeurs, freqs=None, start=None, stop=None, param_S="S21", unite="dB", horodatage=None):
+        valeurs = np.asarray(valeurs)
+        # On garde les complexes en complex128, tout le reste passe en float64
+        # (np.asarray ne copie pas : une découpe par plage reste une vue, même sur un lot 2D)
+        dtype = np.complex128 if np.iscomplexobj(valeurs) else np.float64
+        self.valeurs = np.asarray(valeurs, dtype=dtype)
+        self.npoints = self.valeurs.shape[-1]
+        self.param_S = param_S
+        self.unite = unite
+        self.horodatage = horodatage
+        self._freqs = None
+
+        if freqs is None:
+            # Balayage linéaire : seul start/stop est conservé
+            if start is None or stop is None:
+                raise ValueError("Il faut soit les fréquences, soit start et stop.")
+            self.start = float(start)
+            self.stop = float(stop)
+            return
+
+        freqs = np.ascontiguousarray(freqs, dtype=np.float64)
+        if len(freqs) != self.npoints:
+            raise ValueError("Fréquences et valeurs n'ont pas la même longueur.")
+        self.start = float(freqs[0]) if self.npoints else 0.0
+        self.stop = float(freqs[-1]) if self.npoints else 0.0
+        # Si l'axe est linéaire, inutile de le garder en mémoire
+        if self.npoints < 2 or not self._est_lineaire(freqs):
+            self._freqs = freqs
+
+    @staticmethod
+    def _est_lineaire(freqs):
+        """Vérifie si l'axe des fréquences correspond à un np.linspace(start, stop, n)."""
+        pas = (freqs[-1] - freqs[0]) / (len(freqs) - 1)
+        ref = np.linspace(freqs[0], freqs[-1], len(freqs))
+        return np.allclose(freqs, ref, rtol=0, atol=abs(pas) * 1e-6)
+
+    @classmethod
+    def lineaire(cls, start, stop, valeurs, **meta):
+        """Crée une trace sur un balayage linéaire start → stop."""
+        return cls(valeurs, start=start, stop=stop, **meta)
+
+    @classmethod
+    def depuis_csv(cls, fichier_csv):
+        """
+        Lit un fichier CSV exporté par l'ARV (MMEM:STOR:FDAT) : deux colonnes
+        fréquence et valeur, lignes d'en-tête commençant par '!'.
+        Le paramètre S, l'unité et la date sont récupérés dans l'en-tête.
+        """
+        param_S, unite, horodatage = "S21", "dB", None
+        # utf-8-sig : les fichiers de l'ARV commencent par un BOM
+        with open(fichier_csv, 'r', encoding='utf-8-sig') as f:
+            lignes = f.readlines()
+
+        debut = 0
+        for ligne in lignes:
+            if not ligne.startswith("!"):
+                break
+            debut += 1
+            entete = ligne.lstrip("! ").strip()
+            if entete.startswith("Date:"):
+                try:
+                    horodatage = datetime.strptime(entete[5:].strip(), "%d/%m/%Y %H:%M:%S")
+                except ValueError:
+                    pass
+            elif entete.startswith("Stimulus"):
+                # ex : "Stimulus(Hz),    S21(dB)"
+                colonne = entete.split(",")[-1].strip()
+                if "(" in colonne:
+                    param_S, unite = colonne.rstrip(")").split("(", 1)
+
+        # En-tête texte simple (ex : "freq,gain") : première ligne non numérique ignorée
+        if debut < len(lignes):
+            try:
+                float(lignes[debut].split(",")[0])
+            except ValueError:
+                debut += 1
+
+        # Lecture des colonnes en une seule fois ; les lignes mal formées sont ignorées
+        # (sans avertissement, comme l'ancien chargement ligne par ligne)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            data = np.genfromtxt(lignes[debut:], delimiter=",", comments="!", usecols=(0, 1),
+                                 invalid_raise=False, ndmin=2)
+        data = data[~np.isnan(data).any(axis=1)]
+
+        return cls(data[:, 1], freqs=data[:, 0], param_S=param_S, unite=unite, horodatage=horodatage)
+
+    @classmethod
+    def depuis_scpi(cls, reponse, start, stop, complexe=False, **meta):
+        """
+        Convertit une réponse SCPI (valeurs séparées par des virgules) en trace.
+        Si complexe=True, la réponse est une suite re0, im0, re1, im1, ...
+        """
+        valeurs = np.fromstring(reponse.strip(), dtype=np.float64, sep=",")
+        if complexe:
+            # Les couples (re, im) sont réinterprétés en complex128 sans copie
+            valeurs = valeurs[:len(valeurs) // 2 * 2].view(np.complex128)
+        return cls(valeurs, start=start, stop=stop, **meta)
+
+    @property
+    def freqs(self):
+        """Axe des fréquences (Hz), calculé à la demande pour un balayage linéaire."""
+        if self._freqs is not None:
+            return self._freqs
+        return np.linspace(self.start, self.stop, self.npoints)
+
+    @property
+    def est_lineaire(self):
+        return self._freqs is None
+
+    def __len__(self):
+        return self.npoints
+
+    @property
+    def nb_courbes(self):
+        """Nombre de courbes contenues (1 pour une trace simple)."""
+        return 1 if self.valeurs.ndim == 1 else self.valeurs.shape[0]
+
+    def __getitem__(self, i):
+        """Extrait la i-ème courbe d'un lot (vue, sans copie)."""
+        meta = {"param_S": self.param_S, "unite": self.unite, "horodatage": self.horodatage}
+        if self._freqs is not None:
+            return Trace(self.valeurs[i], freqs=self._freqs, **meta)
+        return Trace(self.valeurs[i], start=self.start, stop=self.stop, **meta)
+
+    def indices(self, freq_min, freq_max):
+        """Indices [i0, i1) des points compris entre freq_min et freq_max."""
+        if self._freqs is not None:
+            i0 = np.searchsorted(self._freqs, freq_min, side="left")
+            i1 = np.searchsorted(self._freqs, freq_max, side="right")
+            return int(i0), int(i1)
+        if self.npoints < 2 or self.stop == self.start:
+            return 0, self.npoints
+        # Axe implicite : les indices se calculent directement
+        pas = (self.stop - self.start) / (self.npoints - 1)
+        i0 = int(np.ceil((freq_min - self.start) / pas - 1e-9))
+        i1 = int(np.floor((freq_max - self.start) / pas + 1e-9)) + 1
+        return max(i0, 0), min(max(i1, 0), self.npoints)
+
+    def plage(self, freq_min, freq_max):
+        """Renvoie la partie de la trace entre freq_min et freq_max (vue, sans copie)."""
+        i0, i1 = self.indices(freq_min, freq_max)
+        i1 = max(i1, i0)
+        meta = {"param_S": self.param_S, "unite": self.unite, "horodatage": self.horodatage}
+        if self._freqs is not None:
+            return Trace(self.valeurs[..., i0:i1], freqs=self._freqs[i0:i1], **meta)
+        pas = (self.stop - self.start) / (self.npoints - 1) if self.npoints > 1 else 0.0
+        return Trace(self.valeurs[..., i0:i1], start=self.start + i0 * pas, stop=self.start + (i1 - 1) * pas, **meta)
+
+    def en_db(self):
+        """Renvoie une trace en dB (20·log10|S|) à partir d'une trace complexe."""
+        if not np.iscomplexobj(self.valeurs):
+            return self
+        valeurs = 20 * np.log10(np.abs(self.valeurs))
+        if self._freqs is not None:
+            return Trace(valeurs, freqs=self._freqs, param_S=self.param_S, unite="dB", horodatage=self.horodatage)
+        return Trace(valeurs, start=self.start, stop=self.stop, param_S=self.param_S, unite="dB",
+                     horodatage=self.horodatage)
+
+    def pic(self):
+        """
+        Fréquence et niveau (dB) du maximum, par courbe (scalaires pour une trace simple).
+        Le maximum est affiné entre deux points par une parabole passant par le point le
+        plus haut et ses deux voisins : la fréquence n'est plus limitée au pas du balayage.
+        """
+        v = np.atleast_2d(self.en_db().valeurs)
+        f = self.freqs
+        n = v.shape[-1]
+        lignes = np.arange(v.shape[0])
+        i = np.argmax(v, axis=-1)
+        y1 = v[lignes, i]
+        freq, niveau = f[i], y1
+        if n >= 3:
+            # Parabole sur (i-1, i, i+1) ; aux bords du balayage, pas d'affinage
+            ic = np.clip(i, 1, n - 2)
+            y0, y2 = v[lignes, ic - 1], v[lignes, ic + 1]
+            courbure = y0 - 2 * y1 + y2
+            with np.errstate(divide="ignore", invalid="ignore"):
+                d = np.where((i == ic) & (courbure < 0), 0.5 * (y0 - y2) / courbure, 0.0)
+            d = np.clip(np.nan_to_num(d), -0.5, 0.5)
+            # Décalage converti en Hz avec le pas du côté où se trouve le sommet
+            pas = np.where(d > 0, f[ic + 1] - f[ic], f[ic] - f[ic - 1])
+            freq = f[i] + d * pas
+            niveau = y1 - 0.25 * (y0 - y2) * d
+        if self.valeurs.ndim == 1:
+            return float(freq[0]), float(niveau[0])
+        return freq, niveau
+
+    def bande(self, ecart_db=3.0):
+        """
+        Bords (f_bas, f_haut) de la bande à -ecart_db sous le maximum, interpolés
+        linéairement entre deux points. NaN si le bord sort de la plage mesurée.
+        Calcul vectorisé : fonctionne aussi sur un lot de courbes.
+        """
+        v = np.atleast_2d(self.en_db().valeurs)
+        f = self.freqs
+        n = v.shape[-1]
+        lignes = np.arange(v.shape[0])
+        ipic = np.argmax(v, axis=-1)
+        seuil = v[lignes, ipic] - ecart_db
+        sous = v < seuil[:, None]
+        idx = np.arange(n)
+
+        # Dernier point sous le seuil à gauche du pic, premier à droite
+        gauche = np.where(sous & (idx < ipic[:, None]), idx, -1).max(axis=-1)
+        droite = np.where(sous & (idx > ipic[:, None]), idx, n).min(axis=-1)
+
+        def _croisement(i0, i1):
+            # Interpolation linéaire du passage au seuil entre les points i0 et i1
+            i0c, i1c = np.clip(i0, 0, n - 1), np.clip(i1, 0, n - 1)
+            v0, v1 = v[lignes, i0c], v[lignes, i1c]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(v1 != v0, (seuil - v0) / (v1 - v0), 0.0)
+            return f[i0c] + t * (f[i1c] - f[i0c])
+
+        f_bas = np.where(gauche >= 0, _croisement(gauche, gauche + 1), np.nan)
+        f_haut = np.where(droite < n, _croisement(droite - 1, droite), np.nan)
+        if self.valeurs.ndim == 1:
+            return float(f_bas[0]), float(f_haut[0])
+        return f_bas, f_haut
+
+    def __repr__(self):
+        lot = f"{self.nb_courbes} courbes × " if self.valeurs.ndim > 1 else ""
+        return (f"Trace({self.param_S}, {lot}{self.npoints} points, "
+                f"{self.start:.6g} → {self.stop:.6g} Hz, {self.unite})")
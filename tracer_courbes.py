@@ -2,48 +2,40 @@ import matplotlib.pyplot as plt
 import numpy as np
 import tempfile
 import os
-import csv
+from trace_arv import Trace
 
 class TracerCourbes:
-    def __init__(self, fichier_csv=None, titre="Mesures Hyperfréquences"):
+    def __init__(self, fichier_csv=None, titre="Mesures Hyperfréquences",
+                 label_x="Fréquence (GHz)", label_y="Amplitude (dB)"):
         # Liste des gabarits à afficher
         self.liste_gabarit = []
         self.titre = titre
+        # Titres des axes (ex : "Temps (s)" pour une réponse temporelle)
+        self.label_x = label_x
+        self.label_y = label_y
 
         # Création de la figure et des axes pour le tracé
         self.fig, self.ax = plt.subplots(figsize=(8, 5))
 
-        # Charge les données depuis le CSV si fourni
-        self.donnees = self.charger_donnees_csv(fichier_csv) if fichier_csv else None
+        # Charge les données depuis le CSV si fourni (ou une Trace déjà en mémoire)
+        if isinstance(fichier_csv, Trace):
+            self.donnees = fichier_csv
+        else:
+            self.donnees = self.charger_donnees_csv(fichier_csv) if fichier_csv else None
 
     def charger_donnees_csv(self, fichier_csv):
         """
         Lit un fichier CSV avec deux colonnes : fréquence et gain.
-        Ignore les lignes mal formées et vérifie si il y a un en-tête.
+        Les lignes d'en-tête ('!') sont ignorées, le résultat est une Trace.
         """
         if not os.path.exists(fichier_csv):
             print(f"Fichier CSV introuvable : {fichier_csv}")
             return None
 
         try:
-            data = []
-            with open(fichier_csv, 'r') as f:
-                reader = csv.reader(f)
-                lignes = list(reader)
-
-                # Détecte si la première ligne est un texte (en-tête)
-                start_index = 1 if any(s.isalpha() for s in lignes[0][0]) else 0
-
-                for row in lignes[start_index:]:
-                    try:
-                        freq = float(row[0].strip())
-                        gain = float(row[1].strip())
-                        data.append((freq, gain))
-                    except ValueError:
-                        continue  # Ignore les lignes incorrectes
-
-            print(f"{len(data)} points chargés depuis : {fichier_csv}")
-            return np.array(data)
+            trace = Trace.depuis_csv(fichier_csv)
+            print(f"{len(trace)} points chargés depuis : {fichier_csv}")
+            return trace
         except Exception as e:
             print(f"Erreur lecture fichier CSV : {e}")
             return None
@@ -58,22 +50,20 @@ class TracerCourbes:
             print("Aucune donnée à tracer.")
             return
 
-        x, y = self.donnees[:, 0], self.donnees[:, 1]
+        trace = self.donnees.en_db()
+        x, y = trace.freqs, trace.valeurs
         self.ax.plot(x, y, label="Signal", color='blue', linewidth=1.5)
 
         # Si des gabarits sont définis
         if self.liste_gabarit:
-            points_dans = []
-            for xi, yi in zip(x, y):
-                for g in self.liste_gabarit:
-                    if g.freq_min <= xi <= g.freq_max and g.att_min <= yi <= g.att_max:
-                        points_dans.append((xi, yi))
-                        break  # Un point ne doit appartenir qu'à un seul gabarit
+            # Un point est marqué dès qu'il tombe dans au moins un gabarit
+            dans = np.zeros(len(trace), dtype=bool)
+            for g in self.liste_gabarit:
+                dans |= g.masque(x, y)
 
             # Trace les points dans les gabarits en rouge
-            if points_dans:
-                x_d, y_d = zip(*points_dans)
-                self.ax.scatter(x_d, y_d, color='red', s=20)
+            if dans.any():
+                self.ax.scatter(x[dans], y[dans], color='red', s=20)
 
             # Tracer les gabarits visuellement
             for g in self.liste_gabarit:
@@ -88,8 +78,8 @@ class TracerCourbes:
         self.ax.legend(unique.values(), unique.keys())
 
         self.ax.set_title(self.titre)
-        self.ax.set_xlabel("Fréquence (GHz)")
-        self.ax.set_ylabel("Amplitude (dB)")
+        self.ax.set_xlabel(self.label_x)
+        self.ax.set_ylabel(self.label_y)
         self.ax.grid(True, linestyle='--', alpha=0.6)
         plt.show()
 
@@ -104,14 +94,14 @@ class TracerCourbes:
             print("Aucun gabarit défini.")
             return False
 
-        freqs = self.donnees[:, 0]
-        gains = self.donnees[:, 1]
+        trace = self.donnees.en_db()
+        freqs = trace.freqs
+        gains = trace.valeurs
 
         for g in gabarits:
-            for f, g_mes in zip(freqs, gains):
-                if g.freq_min <= f <= g.freq_max and g.att_min <= g_mes <= g.att_max:
-                    # Si un point est dans le gabarit => non conforme
-                    return False
+            if g.masque(freqs, gains).any():
+                # Si un point est dans le gabarit => non conforme
+                return False
 
         # Aucun point dans les gabarits => conforme
         return True
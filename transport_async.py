@@ -0,0 +1,270 @@
+import asyncio
+import numpy as np
+from trace_arv import Trace
+
+
+class TransportSCPIAsync:
+    """
+    Connexion SCPI directe sur socket TCP (port 5025 du S2VNA), sans passer par PyVISA.
+    Même interface que les wrappers d'ARV_S2VNA (write, read, query, *OPC?), mais en asyncio :
+    une seule boucle d'évènements peut piloter plusieurs ARV en parallèle.
+    Les requêtes sont mises en file (pipeline) : plusieurs query peuvent être envoyées
+    sans attendre, les réponses sont lues dans l'ordre d'envoi par une tâche de lecture.
+    """
+    # Taille max d'une réponse texte (readuntil) : une trace ASCII de 16001 points complexes
+    # dépasse largement la limite par défaut d'asyncio (64 Kio)
+    LIMITE_LECTURE = 16 * 1024 * 1024
+
+    def __init__(self, adresse, port=5025, terminaison="\n", timeout=10.0):
+        self.adresse = adresse
+        self.port = port
+        self.terminaison = terminaison.encode()
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._attentes = None      # réponses attendues, dans l'ordre d'envoi
+        self._tache_lecture = None
+
+    async def connect(self):
+        """Ouvre la connexion et lance la tâche de lecture des réponses."""
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.adresse, self.port, limit=self.LIMITE_LECTURE), self.timeout)
+        self._attentes = asyncio.Queue()
+        self._tache_lecture = asyncio.create_task(self._lire_reponses())
+        print(f"Connecté (socket) à l'ARV {self.adresse} sur le port {self.port}")
+
+    async def close(self):
+        """Ferme la connexion (les requêtes en attente échouent avec ConnectionError)."""
+        if self._tache_lecture is not None:
+            self._tache_lecture.cancel()
+            self._tache_lecture = None
+        self._echouer_attentes(ConnectionError("Connexion fermée"))
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+            print("Connexion fermée.")
+
+    def _verifier(self):
+        if self._writer is None:
+            raise ConnectionError("Instrument non connecté")
+
+    def _envoyer(self, cmd, binaire=None):
+        """
+        Ajoute la commande au tampon d'envoi. Si une réponse est attendue, la future
+        correspondante est mise en file dans le même pas (sans await) : l'ordre des
+        réponses correspond toujours à l'ordre des commandes.
+        """
+        self._verifier()
+        future = None
+        if binaire is not None:
+            future = asyncio.get_running_loop().create_future()
+            self._attentes.put_nowait((future, binaire))
+        self._writer.write(cmd.encode() + self.terminaison)
+        return future
+
+    def _echouer_attentes(self, erreur):
+        """Fait échouer toutes les requêtes encore en attente de réponse."""
+        if self._attentes is None:
+            return
+        while not self._attentes.empty():
+            future, _ = self._attentes.get_nowait()
+            if not future.done():
+                future.set_exception(erreur)
+
+    async def _lire_reponses(self):
+        """Tâche de fond : lit chaque réponse et la transmet à la requête correspondante."""
+        while True:
+            future, binaire = await self._attentes.get()
+            try:
+                reponse = await (self._lire_bloc() if binaire else self._lire_ligne())
+            except Exception as e:
+                # Après une erreur de lecture, on ne sait plus où commence la réponse suivante :
+                # la connexion est considérée comme perdue et toutes les requêtes échouent
+                erreur = ConnectionError(f"Lecture interrompue : {e!r}")
+                if not future.done():
+                    future.set_exception(erreur)
+                self._couper(erreur)
+                return
+            if not future.done():
+                future.set_result(reponse)
+
+    def _couper(self, erreur):
+        """
+        Connexion désynchronisée (erreur de lecture, requête sans réponse) : les requêtes en
+        attente échouent, la tâche de lecture s'arrête et la socket est fermée.
+        Il faut rappeler connect() pour repartir sur un flux propre.
+        """
+        self._echouer_attentes(erreur)
+        tache, self._tache_lecture = self._tache_lecture, None
+        if tache is not None and tache is not asyncio.current_task():
+            tache.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            print(f"Connexion perdue avec l'ARV {self.adresse} : {erreur}")
+
+    async def _attendre(self, future, cmd):
+        """
+        Attend la réponse d'une requête. Sans réponse dans le délai (ex : requête invalide,
+        à laquelle l'instrument ne répond pas), la réponse suivante serait donnée à la
+        mauvaise requête : la connexion est coupée plutôt que de renvoyer des données fausses.
+        """
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self._couper(ConnectionError(f"Pas de réponse à '{cmd}' : connexion désynchronisée"))
+            raise
+
+    async def _lire_ligne(self):
+        ligne = await self._reader.readuntil(self.terminaison)
+        return ligne[:-len(self.terminaison)].decode().strip()
+
+    async def _lire_bloc(self):
+        """Lit un bloc binaire IEEE 488.2 : #<n><longueur sur n chiffres><données><terminaison>."""
+        entete = await self._reader.readexactly(2)
+        if entete[:1] != b"#":
+            # Pas de bloc binaire : réponse texte (ex : erreur), on lit jusqu'à la terminaison
+            reste = await self._reader.readuntil(self.terminaison)
+            raise ValueError(f"Bloc binaire attendu, reçu : {(entete + reste).decode(errors='replace').strip()}")
+        nb_chiffres = int(entete[1:2])
+        if nb_chiffres == 0:
+            # Bloc de longueur indéfinie : terminé par la terminaison
+            donnees = await self._reader.readuntil(self.terminaison)
+            return donnees[:-len(self.terminaison)]
+        longueur = int(await self._reader.readexactly(nb_chiffres))
+        donnees = await self._reader.readexactly(longueur)
+        # Terminaison après le bloc
+        await self._reader.readuntil(self.terminaison)
+        return donnees
+
+    async def write(self, cmd: str):
+        """Envoie une commande SCPI à l’instrument."""
+        self._envoyer(cmd)
+        await self._writer.drain()
+
+    async def query(self, cmd: str) -> str:
+        """Envoie une requête SCPI et retourne la réponse."""
+        future = self._envoyer(cmd, binaire=False)
+        await self._writer.drain()
+        return await self._attendre(future, cmd)
+
+    async def read(self) -> str:
+        """Lit la réponse à une requête envoyée par write (ex : write("*IDN?") puis read())."""
+        self._verifier()
+        future = asyncio.get_running_loop().create_future()
+        self._attentes.put_nowait((future, False))
+        return await self._attendre(future, "read")
+
+    async def query_binaire(self, cmd: str) -> bytes:
+        """Envoie une requête dont la réponse est un bloc binaire (FORM:DATA REAL)."""
+        future = self._envoyer(cmd, binaire=True)
+        await self._writer.drain()
+        return await self._attendre(future, cmd)
+
+    async def query_valeurs_binaires(self, cmd: str, dtype="<f8") -> np.ndarray:
+        """Requête binaire décodée directement en tableau NumPy (sans passer par du texte)."""
+        return np.frombuffer(await self.query_binaire(cmd), dtype=dtype)
+
+    async def pipeline(self, commandes):
+        """
+        Envoie toutes les commandes d'un coup puis attend leurs réponses.
+        Les commandes finissant par '?' sont des requêtes ; renvoie la liste de leurs réponses.
+        """
+        futures = [(cmd, self._envoyer(cmd, binaire=False if cmd.strip().endswith("?") else None))
+                   for cmd in commandes]
+        await self._writer.drain()
+        return [await self._attendre(f, cmd) for cmd, f in futures if f is not None]
+
+    async def attendre_opc(self):
+        """Attend la fin des opérations en cours (*OPC?)."""
+        return await self.query("*OPC?")
+
+
+class ARV_S2VNA_Async:
+    """
+    Version asyncio des réglages principaux d'ARV_S2VNA, sur TransportSCPIAsync.
+    Les données sont lues en binaire (FORM:DATA REAL, petit-boutiste) et renvoyées en Trace.
+    """
+    def __init__(self, adresse, port=5025, nom="ARV", timeout=10.0):
+        self.nom = nom
+        self.transport = TransportSCPIAsync(adresse, port, timeout=timeout)
+
+    async def connect(self):
+        await self.transport.connect()
+        print(await self.transport.query("*IDN?"))
+        # Données en binaire 64 bits, octets dans l'ordre du PC
+        await self.transport.pipeline(["FORM:DATA REAL", "FORM:BORD SWAP"])
+
+    async def close(self):
+        await self.transport.close()
+
+    async def preset(self):
+        await self.transport.write("*RST")
+        await self.transport.attendre_opc()
+        # *RST remet le format texte : on revient au binaire
+        await self.transport.pipeline(["FORM:DATA REAL", "FORM:BORD SWAP"])
+
+    async def set_frequence(self, freq, span):
+        """Définit la fréquence centrale et l’étendue de balayage."""
+        await self.transport.pipeline([f"SENS:FREQ:CENT {freq}", f"SENS:FREQ:SPAN {span}"])
+
+    async def set_parametre_S(self, param_S):
+        """ Définit le paramètre S à mesurer (S11, S12, S21, S22)"""
+        await self.transport.pipeline(["CALC:CONV:FUNC S", f"CALC:PAR:DEF {param_S}",
+                                       f"CALC:PAR:SEL {param_S}", f"DISP:WIND:TRAC1:FEED {param_S}"])
+
+    async def get_plan_frequence(self):
+        """Renvoie (start, stop, nombre de points) en une seule série de requêtes."""
+        start, stop, points = await self.transport.pipeline(
+            ["SENS:FREQ:STAR?", "SENS:FREQ:STOP?", "SENS:SWE:POIN?"])
+        return float(start), float(stop), int(float(points))
+
+    async def get_declenchement(self):
+        """Renvoie (balayage continu, source de déclenchement) pour pouvoir les restaurer."""
+        continu, source = await self.transport.pipeline(["INIT:CONT?", "TRIG:SOUR?"])
+        return continu.strip() in ("1", "ON"), source.strip()
+
+    async def set_declenchement(self, etat):
+        """Restaure un état lu par get_declenchement."""
+        continu, source = etat
+        await self.transport.pipeline([f"INIT:CONT {'ON' if continu else 'OFF'}", f"TRIG:SOUR {source}"])
+
+    async def balayage(self):
+        """
+        Lance un balayage unique complet (déclenché par le bus) et attend qu'il soit terminé.
+        L'ARV reste en déclenchement bus : lire la trace, puis restaurer l'état avec
+        set_declenchement (en déclenchement interne, la trace serait relue en cours de balayage).
+        """
+        await self.transport.pipeline(["INIT:CONT ON", "TRIG:SOUR BUS", "TRIG:SING"])
+        await self.transport.attendre_opc()
+
+    async def lire_trace_complexe(self, start=None, stop=None, param_S="S21"):
+        """Lit les données complexes (CALC:DATA:SDAT?) en binaire et renvoie une Trace complex128."""
+        if start is None or stop is None:
+            start, stop, _ = await self.get_plan_frequence()
+        valeurs = await self.transport.query_valeurs_binaires("CALC:DATA:SDAT?")
+        return Trace.lineaire(start, stop, valeurs.view(np.complex128), param_S=param_S, unite="")
+
+    async def lire_trace(self, start=None, stop=None, param_S="S21"):
+        """Lit la trace formatée (CALC:DATA:FDAT?) en binaire et renvoie une Trace en dB."""
+        if start is None or stop is None:
+            start, stop, _ = await self.get_plan_frequence()
+        valeurs = await self.transport.query_valeurs_binaires("CALC:DATA:FDAT?")
+        # FDAT : couples (valeur, 0) en log mag
+        return Trace.lineaire(start, stop, valeurs[0::2], param_S=param_S, unite="dB")
+
+
+async def mesurer_stations(stations, param_S="S21"):
+    """
+    Lance un balayage sur plusieurs ARV en même temps et renvoie leurs traces,
+    dans l'ordre de la liste (les entrées/sorties se recouvrent dans la même boucle).
+    """
+    async def _une_station(arv):
+        etat = await arv.get_declenchement()
+        try:
+            await arv.balayage()
+            return await arv.lire_trace(param_S=param_S)
+        finally:
+            await arv.set_declenchement(etat)
+    return await asyncio.gather(*(_une_station(arv) for arv in stations))